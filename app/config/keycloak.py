@@ -1,18 +1,36 @@
 import os
+import hashlib
 import logging
+import queue
+import threading
+import time
 from typing import Dict, Any, Optional
 from urllib.parse import urljoin
+import orjson
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+from app.utils.cache import TTLCache
+
 
 logger = logging.getLogger(__name__)
 
 
+def parse_json_response(response: requests.Response) -> Any:
+    """Розбір JSON відповіді Keycloak через orjson (швидше за стандартний json)"""
+    try:
+        return orjson.loads(response.content)
+    except orjson.JSONDecodeError as e:
+        raise requests.exceptions.InvalidJSONError(f"Некоректна JSON відповідь: {e}", response=response)
+
+
 class KeycloakConfig:
     """Конфігурація підключення до Keycloak"""
 
+    HTTP_POOL_CONNECTIONS = 10
+    HTTP_POOL_MAXSIZE = 20
+
     def __init__(self):
         self.server_url = os.getenv('KEYCLOAK_SERVER_URL', 'http://localhost:8080')
         self.realm = os.getenv('KEYCLOAK_REALM', 'airline-system')
@@ -28,6 +46,11 @@ class KeycloakConfig:
         self.logout_url = f"{self.server_url}/realms/{self.realm}/protocol/openid-connect/logout"
         self.certs_url = f"{self.server_url}/realms/{self.realm}/protocol/openid-connect/certs"
         self.admin_url = f"{self.server_url}/admin/realms/{self.realm}"
+        self.admin_token_url = f"{self.server_url}/realms/master/protocol/openid-connect/token"
+        self.well_known_url = f"{self.server_url}/realms/{self.realm}/.well-known/openid-configuration"
+        self.users_url = f"{self.admin_url}/users"
+        # Шаблони URL для конкретного користувача
+        self.user_url_tmpl = self.users_url + "/{}"
 
         # Налаштування HTTP клієнта
         self.session = self._create_http_session()
@@ -42,19 +65,27 @@ class KeycloakConfig:
             status_forcelist=[429, 500, 502, 503, 504],
         )
 
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        # Тримаємо keep-alive з'єднання для повторного використання між запитами
+        adapter = HTTPAdapter(
+            max_retries=retry_strategy,
+            pool_connections=self.HTTP_POOL_CONNECTIONS,
+            pool_maxsize=self.HTTP_POOL_MAXSIZE,
+        )
         session.mount("http://", adapter)
         session.mount("https://", adapter)
 
         return session
 
+    def close(self) -> None:
+        """Закриває HTTP сесію та всі відкриті з'єднання"""
+        self.session.close()
+
     def get_well_known_config(self) -> Dict[str, Any]:
         """Отримує конфігурацію OpenID Connect"""
-        well_known_url = f"{self.server_url}/realms/{self.realm}/.well-known/openid_configuration"
         try:
-            response = self.session.get(well_known_url, timeout=10)
+            response = self.session.get(self.well_known_url, timeout=10)
             response.raise_for_status()
-            return response.json()
+            return parse_json_response(response)
         except requests.RequestException as e:
             logger.error(f"Помилка отримання конфігурації Keycloak: {e}")
             raise KeycloakConnectionError(f"Не вдалося підключитися до Keycloak: {e}")
@@ -63,19 +94,42 @@ class KeycloakConfig:
 class KeycloakClient:
     """Клієнт для роботи з Keycloak API"""
 
+    # Скільки пам'ятати відкликані refresh токени (секунди); не менше за час життя сесії Keycloak
+    REVOKED_TOKEN_TTL = 36000
+    # Максимальна кількість відкликань, що очікують виконання у фоновому потоці
+    LOGOUT_QUEUE_SIZE = 1000
+
     def __init__(self, config: KeycloakConfig):
         self.config = config
         self._admin_token = None
         self._admin_token_expires = 0
+        self._admin_token_lock = threading.Lock()
+        # Хеші refresh токенів, відкликаних через logout_user
+        self._revoked_tokens = TTLCache(ttl_seconds=self.REVOKED_TOKEN_TTL, max_size=10000)
+        # Черга відкликань, що виконуються фоновим потоком поза запитом
+        self._logout_queue: queue.Queue = queue.Queue(maxsize=self.LOGOUT_QUEUE_SIZE)
+        self._logout_worker: Optional[threading.Thread] = None
+        self._logout_worker_lock = threading.Lock()
+
+    @staticmethod
+    def _token_digest(token: str) -> bytes:
+        """Короткий хеш токена для зберігання в кеші замість самого токена"""
+        return hashlib.blake2b(token.encode(), digest_size=16).digest()
 
     def get_admin_token(self) -> str:
         """Отримує токен адміністратора для роботи з Admin API"""
-        import time
-
-        # Перевіряємо чи токен ще валідний
+        # Перевіряємо чи токен ще валідний (без блокування)
         if self._admin_token and time.time() < self._admin_token_expires:
             return self._admin_token
 
+        # Оновлює токен лише один потік, інші отримують вже оновлений
+        with self._admin_token_lock:
+            if self._admin_token and time.time() < self._admin_token_expires:
+                return self._admin_token
+            return self._fetch_admin_token()
+
+    def _fetch_admin_token(self) -> str:
+        """Запитує новий токен адміністратора у Keycloak"""
         data = {
             'grant_type': 'password',
             'client_id': 'admin-cli',
@@ -85,13 +139,13 @@ class KeycloakClient:
 
         try:
             response = self.config.session.post(
-                f"{self.config.server_url}/realms/master/protocol/openid-connect/token",
+                self.config.admin_token_url,
                 data=data,
                 timeout=10
             )
             response.raise_for_status()
 
-            token_data = response.json()
+            token_data = parse_json_response(response)
             self._admin_token = token_data['access_token']
             self._admin_token_expires = time.time() + token_data.get('expires_in', 300) - 30
 
@@ -114,13 +168,17 @@ class KeycloakClient:
         try:
             response = self.config.session.post(self.config.token_url, data=data, timeout=10)
             response.raise_for_status()
-            return response.json()
+            return parse_json_response(response)
         except requests.RequestException as e:
             logger.error(f"Помилка обміну коду на токен: {e}")
             raise KeycloakAuthError(f"Не вдалося обміняти код на токен: {e}")
 
     def refresh_token(self, refresh_token: str) -> Dict[str, Any]:
         """Оновлює токен доступу"""
+        # Відкликаний токен Keycloak однаково відхилить, тому запит не надсилаємо
+        if self._token_digest(refresh_token) in self._revoked_tokens:
+            raise KeycloakAuthError("Не вдалося оновити токен: токен відкликано")
+
         data = {
             'grant_type': 'refresh_token',
             'client_id': self.config.client_id,
@@ -131,7 +189,7 @@ class KeycloakClient:
         try:
             response = self.config.session.post(self.config.token_url, data=data, timeout=10)
             response.raise_for_status()
-            return response.json()
+            return parse_json_response(response)
         except requests.RequestException as e:
             logger.error(f"Помилка оновлення токена: {e}")
             raise KeycloakAuthError(f"Не вдалося оновити токен: {e}")
@@ -147,13 +205,17 @@ class KeycloakClient:
                 timeout=10
             )
             response.raise_for_status()
-            return response.json()
+            return parse_json_response(response)
         except requests.RequestException as e:
             logger.error(f"Помилка отримання інформації про користувача: {e}")
             raise KeycloakAuthError(f"Не вдалося отримати інформацію про користувача: {e}")
 
     def logout_user(self, refresh_token: str) -> bool:
         """Виходить користувача з системи"""
+        token_digest = self._token_digest(refresh_token)
+        if token_digest in self._revoked_tokens:
+            return True
+
         data = {
             'client_id': self.config.client_id,
             'client_secret': self.config.client_secret,
@@ -163,11 +225,48 @@ class KeycloakClient:
         try:
             response = self.config.session.post(self.config.logout_url, data=data, timeout=10)
             response.raise_for_status()
+            self._revoked_tokens.set(token_digest, True)
             return True
         except requests.RequestException as e:
             logger.error(f"Помилка виходу з системи: {e}")
             return False
 
+    def logout_user_in_background(self, refresh_token: str) -> bool:
+        """
+        Ставить відкликання токена в чергу фонового потоку, не чекаючи відповіді Keycloak
+
+        Returns:
+            False якщо черга переповнена і відкликання відкинуто
+        """
+        self._ensure_logout_worker()
+        try:
+            self._logout_queue.put_nowait(refresh_token)
+            return True
+        except queue.Full:
+            logger.warning("Черга відкликання токенів переповнена, відкликання пропущено")
+            return False
+
+    def _ensure_logout_worker(self) -> None:
+        """Запуск фонового потоку відкликань при першому використанні"""
+        if self._logout_worker is not None:
+            return
+        with self._logout_worker_lock:
+            if self._logout_worker is None:
+                worker = threading.Thread(target=self._logout_worker_loop, daemon=True)
+                worker.start()
+                self._logout_worker = worker
+
+    def _logout_worker_loop(self) -> None:
+        """Виконання відкликань з черги; помилки лише логуються в logout_user"""
+        while True:
+            refresh_token = self._logout_queue.get()
+            try:
+                self.logout_user(refresh_token)
+            except Exception as e:
+                logger.error(f"Помилка фонового виходу з системи: {e}")
+            finally:
+                self._logout_queue.task_done()
+
     def get_user_by_keycloak_id(self, keycloak_id: str) -> Optional[Dict[str, Any]]:
         """Отримує користувача з Keycloak за ID"""
         admin_token = self.get_admin_token()
@@ -175,12 +274,12 @@ class KeycloakClient:
 
         try:
             response = self.config.session.get(
-                f"{self.config.admin_url}/users/{keycloak_id}",
+                self.config.user_url_tmpl.format(keycloak_id),
                 headers=headers,
                 timeout=10
             )
             response.raise_for_status()
-            return response.json()
+            return parse_json_response(response)
         except requests.RequestException as e:
             if e.response and e.response.status_code == 404:
                 return None
@@ -197,8 +296,8 @@ class KeycloakClient:
 
         try:
             response = self.config.session.post(
-                f"{self.config.admin_url}/users",
-                json=user_data,
+                self.config.users_url,
+                data=orjson.dumps(user_data),
                 headers=headers,
                 timeout=10
             )
@@ -227,8 +326,8 @@ class KeycloakClient:
 
         try:
             response = self.config.session.put(
-                f"{self.config.admin_url}/users/{keycloak_id}",
-                json=user_data,
+                self.config.user_url_tmpl.format(keycloak_id),
+                data=orjson.dumps(user_data),
                 headers=headers,
                 timeout=10
             )
@@ -243,7 +342,7 @@ class KeycloakClient:
         try:
             response = self.config.session.get(self.config.certs_url, timeout=10)
             response.raise_for_status()
-            return response.json()
+            return parse_json_response(response)
         except requests.RequestException as e:
             logger.error(f"Помилка отримання публічних ключів: {e}")
             raise KeycloakConnectionError(f"Не вдалося отримати публічні ключі: {e}")
@@ -308,6 +407,11 @@ keycloak_client = KeycloakClient(keycloak_config)
 oauth_config = KeycloakOAuthConfig(keycloak_config)
 
 
+def get_keycloak_config() -> KeycloakConfig:
+    """Повертає спільну конфігурацію Keycloak з єдиною HTTP сесією"""
+    return keycloak_config
+
+
 def get_keycloak_client() -> KeycloakClient:
     """Повертає екземпляр Keycloak клієнта"""
     return keycloak_client
@@ -338,18 +442,22 @@ GROUP_MAPPINGS = {
     'DISPATCHER': '/airline-dispatchers',
 }
 
+# Ролі realm, що мапляться на ролі додатку
+_REALM_ADMIN_ROLES = frozenset({'admin', 'administrator'})
+_REALM_DISPATCHER_ROLES = frozenset({'dispatcher'})
+
 
 def map_keycloak_roles_to_app_roles(keycloak_user: Dict[str, Any]) -> list:
     """Мапить ролі Keycloak на ролі додатку"""
-    app_roles = []
+    app_roles = set()
 
     # Отримуємо ролі з realm_access
     realm_roles = keycloak_user.get('realm_access', {}).get('roles', [])
 
     for role in realm_roles:
-        if role in ['admin', 'administrator']:
-            app_roles.append('ADMIN')
-        elif role in ['dispatcher']:
-            app_roles.append('DISPATCHER')
+        if role in _REALM_ADMIN_ROLES:
+            app_roles.add('ADMIN')
+        elif role in _REALM_DISPATCHER_ROLES:
+            app_roles.add('DISPATCHER')
 
-    return list(set(app_roles))  # Унікальні ролі
\ No newline at end of file
+    return list(app_roles)  # Унікальні ролі
@@ -1,12 +1,112 @@
+import atexit
 import logging
 import logging.handlers
 import os
+import queue
+from contextvars import ContextVar
 from typing import Optional
 
+# ID користувача поточного запиту; встановлюється при автентифікації, щоб не
+# передавати його через кожен виклик лише заради логування
+current_user_id: ContextVar[Optional[int]] = ContextVar("current_user_id", default=None)
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, що не блокує запит при переповненій черзі, а відкидає запис"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _BatchFlushFileHandler(logging.handlers.RotatingFileHandler):
+    """RotatingFileHandler, що скидає буфер файлу один раз на пачку записів, а не на кожен запис"""
+
+    def flush(self) -> None:
+        # Викликається з emit для кожного запису; справжнє скидання робить flush_batch
+        pass
+
+    def flush_batch(self) -> None:
+        super().flush()
+
+
+class _BatchingQueueListener(logging.handlers.QueueListener):
+    """QueueListener, що обробляє записи пачками і скидає файлові буфери після кожної пачки
+
+    Перевизначає приватний QueueListener._monitor - цикл фонового потоку. Він
+    повторює стандартну реалізацію (dequeue, _sentinel, task_done), тому при
+    оновленні Python треба звіряти його з logging.handlers.
+    """
+
+    # Максимальна кількість записів між скиданнями буферів
+    BATCH_SIZE = 50
+    # Скільки секунд stop() чекає на місце в переповненій черзі для sentinel
+    STOP_TIMEOUT = 5.0
+
+    def stop(self) -> None:
+        """Зупинка потоку після обробки всіх записів у черзі.
+
+        Стандартний stop() ставить sentinel через put_nowait і при переповненій
+        обмеженій черзі падає з queue.Full, втрачаючи останню пачку. Тут sentinel
+        ставиться з очікуванням, поки потік звільнить місце.
+        """
+        if self._thread is None:
+            return
+        try:
+            self.queue.put(self._sentinel, timeout=self.STOP_TIMEOUT)
+        except queue.Full:
+            # Потік не встигає розібрати чергу - не блокуємо завершення процесу
+            self._thread = None
+            return
+        self._thread.join()
+        self._thread = None
+
+    def _flush_batch(self) -> None:
+        for handler in self.handlers:
+            flush_batch = getattr(handler, 'flush_batch', None)
+            if flush_batch is not None:
+                flush_batch()
+
+    def _monitor(self) -> None:
+        q = self.queue
+        while True:
+            # Чекаємо перший запис, далі забираємо вже наявні без очікування,
+            # тому при низькому навантаженні запис потрапляє у файл одразу
+            record = self.dequeue(True)
+            handled = 0
+            stop = False
+            while True:
+                if record is self._sentinel:
+                    stop = True
+                    q.task_done()
+                    break
+                self.handle(record)
+                q.task_done()
+                handled += 1
+                if handled >= self.BATCH_SIZE:
+                    break
+                try:
+                    record = q.get_nowait()
+                except queue.Empty:
+                    break
+
+            self._flush_batch()
+            if stop:
+                break
+
 
 class LoggingConfig:
     """Клас для налаштування та управління системою логування авіакомпанії"""
 
+    # Максимальна кількість записів, що очікують запису у фоновому потоці
+    LOG_QUEUE_SIZE = 10000
+
     def __init__(self, log_dir: str = "logs", log_level: str = "INFO"):
         self.log_dir = log_dir
         self.log_level = getattr(logging, log_level.upper())
@@ -17,9 +117,12 @@ class LoggingConfig:
         # Ініціалізуємо логери
         self.app_logger = None
         self.access_logger = None
+        self._queue_handlers = []
+        self._queue_listeners = []
 
         # Налаштовуємо логування
         self.setup_logging()
+        atexit.register(self.shutdown)
 
     def _create_log_directory(self) -> None:
         """Створює директорію для логів якщо її немає"""
@@ -38,7 +141,8 @@ class LoggingConfig:
     def _create_rotating_handler(self, filename: str, level: int,
                                  formatter: logging.Formatter) -> logging.handlers.RotatingFileHandler:
         """Створює RotatingFileHandler з заданими параметрами"""
-        handler = logging.handlers.RotatingFileHandler(
+        # Хендлер працює лише у фоновому потоці черги, який скидає буфер пачками
+        handler = _BatchFlushFileHandler(
             filename=os.path.join(self.log_dir, filename),
             maxBytes=10 * 1024 * 1024,  # 10MB
             backupCount=5,
@@ -48,6 +152,17 @@ class LoggingConfig:
         handler.setFormatter(formatter)
         return handler
 
+    def _attach_queue(self, logger: logging.Logger, *handlers: logging.Handler) -> None:
+        """Підключає хендлери до логера через обмежену чергу та фоновий потік"""
+        log_queue = queue.Queue(maxsize=self.LOG_QUEUE_SIZE)
+        queue_handler = _DroppingQueueHandler(log_queue)
+        listener = _BatchingQueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+
+        logger.addHandler(queue_handler)
+        self._queue_handlers.append(queue_handler)
+        self._queue_listeners.append(listener)
+
     def setup_logging(self) -> None:
         """Налаштовує систему логування"""
         # Основний логер додатку
@@ -55,6 +170,7 @@ class LoggingConfig:
         self.app_logger.setLevel(self.log_level)
 
         # Очищаємо попередні хендлери якщо є
+        self._stop_queue_listeners()
         self.app_logger.handlers.clear()
 
         formatter = self._get_formatter("standard")
@@ -70,10 +186,9 @@ class LoggingConfig:
         console_handler.setLevel(self.log_level)
         console_handler.setFormatter(formatter)
 
-        # Додаємо хендлери
-        self.app_logger.addHandler(app_handler)
-        self.app_logger.addHandler(error_handler)
-        self.app_logger.addHandler(console_handler)
+        # Запис у файли та консоль виконується у фоновому потоці, тому події
+        # (зокрема події авторизації) не додають файлового I/O до часу запиту
+        self._attach_queue(self.app_logger, app_handler, error_handler, console_handler)
 
         # Налаштовуємо access логер
         self._setup_access_logger()
@@ -89,7 +204,8 @@ class LoggingConfig:
         access_formatter = self._get_formatter("access")
         access_handler = self._create_rotating_handler("access.log", logging.INFO, access_formatter)
 
-        self.access_logger.addHandler(access_handler)
+        # Access лог пишеться на кожен запит, тому теж через фонову чергу
+        self._attach_queue(self.access_logger, access_handler)
 
         # Запобігаємо передачі повідомлень до батьківського логера
         self.access_logger.propagate = False
@@ -110,29 +226,54 @@ class LoggingConfig:
         """Логування налагоджувальних повідомлень"""
         self.app_logger.debug(message)
 
+    def is_debug_enabled(self) -> bool:
+        """Перевірка чи увімкнено налагоджувальне логування"""
+        return self.app_logger.isEnabledFor(logging.DEBUG)
+
     def log_access(self, method: str, path: str, status_code: int,
                    user_id: Optional[int] = None, ip_address: Optional[str] = None,
                    response_time: Optional[float] = None) -> None:
         """Логування HTTP запитів"""
-        user_info = f"user_id={user_id}" if user_id else "anonymous"
-        ip_info = f"ip={ip_address}" if ip_address else "ip=unknown"
-        time_info = f"time={response_time:.3f}s" if response_time else ""
+        # Рядок повідомлення не будується, якщо рівень INFO відфільтровано
+        if not self.access_logger.isEnabledFor(logging.INFO):
+            return
+
+        if user_id is None:
+            user_id = current_user_id.get()
+        # Повідомлення збирається одним join без проміжних рядків для кожної частини
+        parts = [method, " ", path, " - ", str(status_code), " - "]
+        if user_id:
+            parts += ("user_id=", str(user_id))
+        else:
+            parts.append("anonymous")
+        parts += (" - ip=", ip_address or "unknown")
+        if response_time:
+            parts.append(f" time={response_time:.3f}s")
 
-        message = f"{method} {path} - {status_code} - {user_info} - {ip_info} {time_info}".strip()
-        self.access_logger.info(message)
+        self.access_logger.info("".join(parts))
 
     def log_database_operation(self, operation: str, table: str, record_id: Optional[int] = None,
                                user_id: Optional[int] = None) -> None:
         """Логування операцій з базою даних"""
-        record_info = f"record_id={record_id}" if record_id else ""
-        user_info = f"user_id={user_id}" if user_id else ""
+        if not self.app_logger.isEnabledFor(logging.INFO):
+            return
 
-        message = f"DB {operation} on {table} - {record_info} {user_info}".strip()
-        self.app_logger.info(message)
+        if user_id is None:
+            user_id = current_user_id.get()
+        parts = ["DB ", operation, " on ", table, " -"]
+        if record_id:
+            parts += (" record_id=", str(record_id))
+        if user_id:
+            parts += (" user_id=", str(user_id))
+
+        self.app_logger.info("".join(parts))
 
     def log_auth_event(self, event_type: str, username: str, ip_address: Optional[str] = None,
                        success: bool = True) -> None:
         """Логування подій авторизації"""
+        if not self.app_logger.isEnabledFor(logging.INFO if success else logging.WARNING):
+            return
+
         status = "SUCCESS" if success else "FAILED"
         ip_info = f"from {ip_address}" if ip_address else ""
 
@@ -149,8 +290,24 @@ class LoggingConfig:
             return logging.getLogger(f"airline_system.{name}")
         return self.app_logger
 
+    @property
+    def dropped_records(self) -> int:
+        """Кількість записів, відкинутих через переповнену чергу"""
+        return sum(handler.dropped for handler in self._queue_handlers)
+
+    def _stop_queue_listeners(self) -> None:
+        """Зупиняє фонові потоки, дописавши всі записи з черг"""
+        for listener in self._queue_listeners:
+            listener.stop()
+            for handler in listener.handlers:
+                handler.close()
+        self._queue_listeners.clear()
+        self._queue_handlers.clear()
+
     def shutdown(self) -> None:
         """Закриває всі хендлери логування"""
+        self._stop_queue_listeners()
+
         if self.app_logger:
             for handler in self.app_logger.handlers:
                 handler.close()
@@ -185,6 +342,16 @@ def log_debug(message: str) -> None:
     logger_config.log_debug(message)
 
 
+def is_debug_enabled() -> bool:
+    """Перевірка чи увімкнено налагоджувальне логування"""
+    return logger_config.is_debug_enabled()
+
+
+def is_enabled_for(level: int) -> bool:
+    """Перевірка чи логер додатку пропускає записи заданого рівня"""
+    return logger_config.app_logger.isEnabledFor(level)
+
+
 def log_access(method: str, path: str, status_code: int,
                user_id: Optional[int] = None, ip_address: Optional[str] = None,
                response_time: Optional[float] = None) -> None:
@@ -1,12 +1,12 @@
 import logging
-from typing import Optional
+from typing import Any, Dict, Optional
 
 from fastapi import APIRouter, HTTPException, Depends, status
 from fastapi.responses import RedirectResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
 
-from app.config.keycloak import KeycloakOAuthConfig, KeycloakConfig
+from app.config.keycloak import get_oauth_config
 from app.models.user import User
 from app.services.auth_service import AuthService, AuthenticationError, AuthorizationError
 from app.utils.decorators import LoggingDecorators, ErrorHandlingDecorators
@@ -17,7 +17,7 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/auth", tags=["Аутентифікація"])
 security = HTTPBearer()
 
-key = KeycloakOAuthConfig(KeycloakConfig)
+key = get_oauth_config()
 
 # Моделі запитів/відповідей
 class LoginRequest(BaseModel):
@@ -42,6 +42,11 @@ class UserInfoResponse(BaseModel):
     permissions: list[str]
 
 
+class UserProfileResponse(BaseModel):
+    user: User
+    keycloak_data: Optional[Dict[str, Any]] = None
+
+
 class KeycloakCallbackRequest(BaseModel):
     code: str
     state: Optional[str] = None
@@ -176,6 +181,25 @@ def get_current_user_info(
         )
 
 
+@router.get("/me/full", response_model=UserProfileResponse)
+@log_execution
+@handle_exceptions
+def get_current_user_profile(
+        current_user: User = Depends(get_current_user_dep),
+        auth_service: AuthService = Depends(get_auth_service)
+):
+    """
+    Отримати повний профіль поточного користувача разом з даними Keycloak
+    """
+    profile = auth_service.get_user_profile(current_user.id, include_keycloak=True)
+    if not profile:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Користувача не знайдено"
+        )
+    return UserProfileResponse(**profile)
+
+
 @router.get("/keycloak/login")
 @log_execution
 @handle_exceptions
@@ -251,13 +275,12 @@ def validate_token(
     Валідація JWT токена
     """
     try:
-        token = credentials.credentials
-        is_valid = auth_service.validate_token(token)
-        if is_valid:
-            user = auth_service.get_current_user(token)
+        # validate_token вже повертає користувача, повторна перевірка не потрібна
+        user = auth_service.validate_token(credentials.credentials)
+        if user:
             return {
                 "valid": True,
-                "user": user.dict() if user else None
+                "user": user.dict()
             }
         else:
             return {"valid": False}
@@ -286,7 +309,7 @@ def change_user_status(
                 detail="Тільки адміністратори можуть змінювати статус користувачів"
             )
 
-        result = auth_service.change_user_status(user_id, is_active)
+        result = auth_service.change_user_status(user_id, is_active, current_user)
         if result:
             return {"message": "Статус користувача успішно змінено"}
         else:
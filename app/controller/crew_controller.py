@@ -4,8 +4,9 @@ from fastapi import APIRouter, Depends, HTTPException, Query, status
 from app.utils.decorators import ErrorHandlingDecorators
 from app.config.logging_config import log_info, log_error
 from app.services.crew_service import CrewService
-from app.utils.decorators import AuthDecorators
+from app.utils.decorators import AuthDecorators, ADMIN_ONLY, ADMIN_OR_DISPATCHER
 from app.utils.validators import CrewValidator, ValidationError
+from app.utils.mappers import CrewMemberMapper, CrewPositionMapper
 
 router = APIRouter(prefix="/api/crew", tags=["crew"])
 crew_service = CrewService()
@@ -16,7 +17,7 @@ handle_exceptions = ErrorHandlingDecorators.handle_exceptions
 @router.post("/members", response_model=dict, status_code=status.HTTP_201_CREATED)
 @handle_exceptions
 @jwt_required
-@role_required(["ADMIN"])
+@role_required(ADMIN_ONLY)
 def create_crew_member(crew_data: dict, current_user=Depends()):
     """
     Створити нового члена екіпажу (тільки для адміністраторів)
@@ -136,7 +137,7 @@ def get_available_crew(
 
         return {
             "status": "success",
-            "data": [crew.dict() for crew in available_crew],
+            "data": CrewMemberMapper.to_dict_list(available_crew),
             "count": len(available_crew)
         }
 
@@ -151,7 +152,7 @@ def get_available_crew(
 @router.put("/members/{crew_id}", response_model=dict)
 @handle_exceptions
 @jwt_required
-@role_required(["ADMIN"])
+@role_required(ADMIN_ONLY)
 def update_crew_member(crew_id: int, crew_data: dict, current_user=Depends()):
     """
     Оновити інформацію про члена екіпажу (тільки для адміністраторів)
@@ -196,7 +197,7 @@ def update_crew_member(crew_id: int, crew_data: dict, current_user=Depends()):
 @router.patch("/members/{crew_id}/availability", response_model=dict)
 @handle_exceptions
 @jwt_required
-@role_required(["ADMIN", "DISPATCHER"])
+@role_required(ADMIN_OR_DISPATCHER)
 def set_crew_availability(
         crew_id: int,
         availability_data: dict,
@@ -250,7 +251,7 @@ def get_all_positions(current_user=Depends()):
 
         return {
             "status": "success",
-            "data": [position.dict() for position in positions],
+            "data": CrewPositionMapper.to_dict_list(positions),
             "count": len(positions)
         }
 
@@ -296,7 +297,7 @@ def get_position(position_id: int, current_user=Depends()):
 @router.get("/statistics/workload", response_model=dict)
 @handle_exceptions
 @jwt_required
-@role_required(["ADMIN"])
+@role_required(ADMIN_ONLY)
 def get_crew_workload_statistics(
         start_date: Optional[date] = Query(None, description="Початкова дата"),
         end_date: Optional[date] = Query(None, description="Кінцева дата"),
@@ -365,7 +366,7 @@ def check_crew_member_availability(
 @router.get("/recommendations/{flight_id}", response_model=dict)
 @handle_exceptions
 @jwt_required
-@role_required(["ADMIN", "DISPATCHER"])
+@role_required(ADMIN_OR_DISPATCHER)
 def get_crew_recommendations(flight_id: int, current_user=Depends()):
     """
     Отримати рекомендації щодо призначення екіпажу для рейсу
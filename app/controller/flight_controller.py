@@ -1,5 +1,6 @@
 import logging
 from datetime import datetime, date
+from functools import lru_cache
 from typing import Optional, List
 
 from fastapi import APIRouter, HTTPException, Depends, Query, status
@@ -8,8 +9,9 @@ from pydantic import BaseModel, validator
 from .auth_controller import get_current_user_dep
 from app.models.flight import Flight
 from app.models.user import User
-from app.services.flight_service import FlightService
+from app.services.flight_service import FlightService, VALID_FLIGHT_STATUSES
 from app.utils.decorators import AuthDecorators, LoggingDecorators, ErrorHandlingDecorators, ValidationDecorators
+from app.utils.decorators import ADMIN_ONLY, ADMIN_OR_DISPATCHER
 from app.utils.validators import FlightValidator, ValidationError
 
 logger = logging.getLogger(__name__)
@@ -73,14 +75,17 @@ class FlightScheduleResponse(BaseModel):
 
 
 # Залежності
+@lru_cache()
 def get_flight_service() -> FlightService:
+    # Сервіс не має стану запиту, тому репозиторії, валідатор і маппер
+    # створюються один раз, а не на кожен запит
     return FlightService()
 
 
 @router.post("/", response_model=FlightResponse, status_code=status.HTTP_201_CREATED)
 @log_execution
 @handle_exceptions
-@role_required(["ADMIN", "DISPATCHER"])
+@role_required(ADMIN_OR_DISPATCHER)
 def create_flight(
         request: CreateFlightRequest,
         current_user: User = Depends(get_current_user_dep),
@@ -90,14 +95,11 @@ def create_flight(
     Створення нового рейсу (тільки для адміністратора/диспетчера)
     """
     try:
-        # Валідація даних рейсу
-        FlightValidator.validate_flight_data(request.dict())
+        # Запит серіалізується один раз; валідацію виконує сервіс
+        flight_data = request.model_dump()
 
-        flight_data = request.dict()
-        flight_data['created_by'] = current_user.id
-
-        flight =  flight_service.create_flight(flight_data)
-        crew_summary =  flight_service.get_flight_crew_summary(flight.id)
+        flight =  flight_service.create_flight(flight_data, current_user.id)
+        crew_summary =  flight_service.get_flight_crew_summary(flight.id, flight)
 
         return FlightResponse(flight=flight, crew_summary=crew_summary)
 
@@ -136,7 +138,7 @@ def get_flight(
 
         crew_summary = None
         if include_crew:
-            crew_summary =  flight_service.get_flight_crew_summary(flight_id)
+            crew_summary =  flight_service.get_flight_crew_summary(flight_id, flight)
 
         return FlightResponse(flight=flight, crew_summary=crew_summary)
 
@@ -169,7 +171,7 @@ def get_flight_by_number(
                 detail="Рейс не знайдено"
             )
 
-        crew_summary =  flight_service.get_flight_crew_summary(flight.id)
+        crew_summary =  flight_service.get_flight_crew_summary(flight.id, flight)
         return FlightResponse(flight=flight, crew_summary=crew_summary)
 
     except HTTPException:
@@ -281,7 +283,7 @@ def get_daily_schedule(
 @router.put("/{flight_id}", response_model=FlightResponse)
 @log_execution
 @handle_exceptions
-@role_required(["ADMIN", "DISPATCHER"])
+@role_required(ADMIN_OR_DISPATCHER)
 def update_flight(
         flight_id: int,
         request: UpdateFlightRequest,
@@ -301,12 +303,13 @@ def update_flight(
             )
 
         # Валідація даних для оновлення
-        update_data = {k: v for k, v in request.dict().items() if v is not None}
+        # Лише передані поля, без побудови повного словника з подальшою фільтрацією
+        update_data = request.model_dump(exclude_none=True)
         if update_data:
             FlightValidator.validate_flight_data(update_data, partial=True)
 
         updated_flight =  flight_service.update_flight(flight_id, update_data)
-        crew_summary =  flight_service.get_flight_crew_summary(flight_id)
+        crew_summary =  flight_service.get_flight_crew_summary(flight_id, updated_flight)
 
         return FlightResponse(flight=updated_flight, crew_summary=crew_summary)
 
@@ -328,7 +331,7 @@ def update_flight(
 @router.patch("/{flight_id}/status")
 @log_execution
 @handle_exceptions
-@role_required(["ADMIN", "DISPATCHER"])
+@role_required(ADMIN_OR_DISPATCHER)
 def update_flight_status(
         flight_id: int,
         new_status: str = Query(..., description="Новий статус рейсу"),
@@ -340,11 +343,10 @@ def update_flight_status(
     """
     try:
         # Валідація статусу
-        valid_statuses = ['SCHEDULED', 'DELAYED', 'CANCELLED', 'COMPLETED']
-        if new_status not in valid_statuses:
+        if new_status not in VALID_FLIGHT_STATUSES:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Невірний статус. Має бути один з: {', '.join(valid_statuses)}"
+                detail=f"Невірний статус. Має бути один з: {', '.join(sorted(VALID_FLIGHT_STATUSES))}"
             )
 
         updated_flight =  flight_service.update_flight_status(flight_id, new_status)
@@ -369,7 +371,7 @@ def update_flight_status(
 @router.delete("/{flight_id}")
 @log_execution
 @handle_exceptions
-@role_required(["ADMIN"])
+@role_required(ADMIN_ONLY)
 def delete_flight(
         flight_id: int,
         current_user: User = Depends(get_current_user_dep),
@@ -388,7 +390,7 @@ def delete_flight(
             )
 
         # Перевірка наявності призначень екіпажу
-        crew_summary =  flight_service.get_flight_crew_summary(flight_id)
+        crew_summary =  flight_service.get_flight_crew_summary(flight_id, existing_flight)
         if crew_summary and crew_summary.get('assigned_crew_count', 0) > 0:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -426,15 +428,13 @@ def get_flight_crew_summary(
     Отримання зведеної інформації про екіпаж для конкретного рейсу
     """
     try:
-        # Перевірка існування рейсу
-        flight =  flight_service.get_flight_by_id(flight_id)
-        if not flight:
+        # Рейс і призначення завантажуються сервісом одним запитом
+        crew_summary =  flight_service.get_flight_crew_summary(flight_id)
+        if crew_summary is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Рейс не знайдено"
             )
-
-        crew_summary =  flight_service.get_flight_crew_summary(flight_id)
         return crew_summary
 
     except HTTPException:
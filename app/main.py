@@ -15,6 +15,7 @@ import uvicorn
 # Імпорти конфігурації
 from app.config.settings import get_settings
 from app.config.database import init_database, close_database
+from app.config.keycloak import keycloak_config
 from app.config.logging_config import setup_logging, get_logger, log_info, log_error
 
 # Імпорти middleware
@@ -60,6 +61,8 @@ async def lifespan(app: FastAPI):
     try:
         await close_database()
         log_info("Database connection closed")
+        keycloak_config.close()
+        log_info("Keycloak HTTP session closed")
         log_info("Application shutdown completed")
     except Exception as e:
         log_error(f"Error during shutdown: {str(e)}")
@@ -223,6 +226,19 @@ async def add_security_headers(request: Request, call_next):
 
 
 # Функція для запуску сервера
+def _select_event_loop() -> str:
+    """
+    Вибір реалізації event loop для uvicorn: uvloop (libuv) якщо доступний
+    """
+    if sys.platform == "win32":
+        return "asyncio"
+    try:
+        import uvloop  # noqa: F401 - встановлюється разом з uvicorn[standard]
+    except ImportError:
+        return "asyncio"
+    return "uvloop"
+
+
 def run_server():
     """
     Запуск сервера з налаштуваннями
@@ -240,7 +256,7 @@ def run_server():
         reload=settings.is_development(),
         log_level=settings.LOG_LEVEL.lower(),
         access_log=True,
-        loop="asyncio" if sys.platform != "win32" else "asyncio",
+        loop=_select_event_loop(),
         workers=1 if settings.is_development() else settings.WORKERS
     )
 
@@ -1,16 +1,20 @@
+import hashlib
 import logging
 from functools import wraps
 from typing import Optional, List, Callable
 
 from fastapi import HTTPException, Request, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from starlette.concurrency import run_in_threadpool
 
 from app.config.keycloak import KeycloakClient, keycloak_config
 from app.config import get_settings
+from app.config.logging_config import current_user_id
 from app.models.user import User
 from app.services.auth_service import AuthService
 from app.controller import get_auth_service
-from app.utils.jwt_utils import JWTManager, KeycloakJWTManager
+from app.utils.cache import TTLCache
+from app.utils.jwt_utils import JWTManager, KeycloakJWTManager, JWTError, InvalidTokenError, TokenExpiredError
 
 logger = logging.getLogger(__name__)
 security = HTTPBearer()
@@ -22,11 +26,18 @@ class AuthMiddleware:
     Перевіряє JWT токени та інтеграцію з Keycloak
     """
 
+    # Скільки секунд пам'ятаємо токени, що не пройшли перевірку
+    BAD_TOKEN_TTL = 60
+    BAD_TOKEN_CACHE_SIZE = 10000
+
     def __init__(self, keycloak_client: KeycloakClient, jwt_manager: JWTManager):
         self.keycloak_client = keycloak_client
-        self.jwtkey_manager = KeycloakJWTManager(keycloak_config)
+        self.jwtkey_manager = KeycloakJWTManager(keycloak_config, session=keycloak_config.session)
         self.jwt_manager = JWTManager()
         self.settings = get_settings()
+        # Негативний кеш: повторні запити з тим самим недійсним токеном
+        # відхиляються без повторної перевірки підпису
+        self._bad_tokens = TTLCache(ttl_seconds=self.BAD_TOKEN_TTL, max_size=self.BAD_TOKEN_CACHE_SIZE)
 
     def __call__(self, request: Request, call_next):
         """
@@ -90,15 +101,18 @@ class AuthMiddleware:
             return authorization.split(" ")[1]
         return None
 
-    async def _validate_token(self, token: str) -> Optional[dict]:
+    def _validate_token(self, token: str) -> Optional[dict]:
         """
         Валідує JWT токен (локальний або Keycloak)
         """
+        token_digest = hashlib.blake2b(token.encode(), digest_size=16).digest()
+        if token_digest in self._bad_tokens:
+            return None
+
         try:
-            # Спочатку пробуємо валідувати як локальний JWT
-            if self.jwt_manager.is_token_valid(token):
-                return self.jwt_manager.get_user_from_token(token)
-        except:
+            # Спочатку пробуємо валідувати як локальний JWT (один decode замість двох)
+            return self.jwt_manager.get_user_from_token(token)
+        except JWTError:
             pass
 
         try:
@@ -106,9 +120,15 @@ class AuthMiddleware:
             keycloak_user_info = self.jwtkey_manager.decode_keycloak_token(token)
             if keycloak_user_info:
                 return keycloak_user_info
+        except (InvalidTokenError, TokenExpiredError) as e:
+            logger.warning(f"Token validation failed: {str(e)}")
         except Exception as e:
+            # Збій Keycloak чи завантаження JWKS не означає, що токен недійсний,
+            # тому не запам'ятовуємо його - наступний запит перевірить знову
             logger.warning(f"Token validation failed: {str(e)}")
+            return None
 
+        self._bad_tokens.set(token_digest, True)
         return None
 
 
@@ -133,7 +153,7 @@ def jwt_required(func: Callable = None, *, optional: bool = False):
                     detail="Request object not found"
                 )
 
-            if not optional and not hasattr(request.state, 'current_user'):
+            if not optional and getattr(request.state, 'current_user', None) is None:
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     detail="Authentication required"
@@ -153,6 +173,8 @@ def role_required(required_roles: List[str]):
     """
     Декоратор для перевірки ролі користувача
     """
+    # Набір ролей будується один раз при оголошенні маршруту, а не на кожен запит
+    allowed_roles = frozenset(role.upper() for role in required_roles)
 
     def decorator(func: Callable):
         @wraps(func)
@@ -164,16 +186,16 @@ def role_required(required_roles: List[str]):
                     request = arg
                     break
 
-            if not request or not hasattr(request.state, 'current_user'):
+            user_info = getattr(request.state, 'current_user', None) if request else None
+            if user_info is None:
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     detail="Authentication required"
                 )
 
-            user_info = request.state.current_user
             user_role = user_info.get('role', '').upper()
 
-            if user_role not in [role.upper() for role in required_roles]:
+            if user_role not in allowed_roles:
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN,
                     detail=f"Access denied. Required roles: {', '.join(required_roles)}"
@@ -196,12 +218,17 @@ async def get_current_user(
     """
     try:
         token = credentials.credentials
-        user = await auth_service.get_current_user(token)
+        # Перевірка підпису та запит до БД синхронні, тому виконуємо їх у пулі
+        # потоків, щоб не блокувати event loop
+        user = await run_in_threadpool(auth_service.get_current_user, token)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid authentication credentials"
             )
+        # Встановлюємо в контексті запиту (а не в потоці пулу), щоб значення
+        # бачили обробник та логування операцій
+        current_user_id.set(user.id)
         return user
     except Exception as e:
         logger.error(f"Error getting current user: {str(e)}")
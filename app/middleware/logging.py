@@ -26,7 +26,7 @@ class LoggingMiddleware(BaseHTTPMiddleware):
         if any(request.url.path.startswith(path) for path in self.exclude_paths):
             return await call_next(request)
 
-        start_time = time.time()
+        start_time = time.perf_counter()
 
         # Логування вхідного запиту
         await self._log_request(request)
@@ -36,7 +36,7 @@ class LoggingMiddleware(BaseHTTPMiddleware):
             response = await call_next(request)
 
             # Розраховуємо час виконання
-            process_time = time.time() - start_time
+            process_time = time.perf_counter() - start_time
 
             # Логування відповіді
             await self._log_response(request, response, process_time)
@@ -44,10 +44,21 @@ class LoggingMiddleware(BaseHTTPMiddleware):
             return response
 
         except Exception as e:
-            process_time = time.time() - start_time
+            process_time = time.perf_counter() - start_time
             await self._log_error(request, e, process_time)
             raise
 
+    @staticmethod
+    def _get_username(request: Request) -> str:
+        """
+        Повертає ім'я поточного користувача або Anonymous
+        """
+        # Один getattr з default замість hasattr + повторного доступу до атрибута
+        user_data = getattr(request.state, 'current_user', None)
+        if user_data is None:
+            return "Anonymous"
+        return user_data.get('username', 'Unknown')
+
     async def _log_request(self, request: Request):
         """
         Логує вхідний запит
@@ -57,10 +68,7 @@ class LoggingMiddleware(BaseHTTPMiddleware):
             user_agent = request.headers.get("User-Agent", "Unknown")
 
             # Отримуємо інформацію про користувача якщо доступна
-            user_info = "Anonymous"
-            if hasattr(request.state, 'current_user'):
-                user_data = request.state.current_user
-                user_info = user_data.get('username', 'Unknown')
+            user_info = self._get_username(request)
 
             log_data = {
                 "event": "request_received",
@@ -89,10 +97,7 @@ class LoggingMiddleware(BaseHTTPMiddleware):
         try:
             client_ip = request.client.host if request.client else "Unknown"
 
-            user_info = "Anonymous"
-            if hasattr(request.state, 'current_user'):
-                user_data = request.state.current_user
-                user_info = user_data.get('username', 'Unknown')
+            user_info = self._get_username(request)
 
             log_data = {
                 "event": "response_sent",
@@ -124,10 +129,7 @@ class LoggingMiddleware(BaseHTTPMiddleware):
         try:
             client_ip = request.client.host if request.client else "Unknown"
 
-            user_info = "Anonymous"
-            if hasattr(request.state, 'current_user'):
-                user_data = request.state.current_user
-                user_info = user_data.get('username', 'Unknown')
+            user_info = self._get_username(request)
 
             log_data = {
                 "event": "request_error",
@@ -156,19 +158,19 @@ def request_logging(operation_name: str = None):
         @wraps(func)
         async def wrapper(*args, **kwargs):
             func_name = operation_name or f"{func.__module__}.{func.__name__}"
-            start_time = time.time()
+            start_time = time.perf_counter()
 
             try:
                 log_info(f"Starting operation: {func_name}")
                 result = await func(*args, **kwargs)
 
-                process_time = time.time() - start_time
+                process_time = time.perf_counter() - start_time
                 log_info(f"Operation completed: {func_name} in {process_time:.4f}s")
 
                 return result
 
             except Exception as e:
-                process_time = time.time() - start_time
+                process_time = time.perf_counter() - start_time
                 log_error(f"Operation failed: {func_name} in {process_time:.4f}s - {str(e)}")
                 raise
 
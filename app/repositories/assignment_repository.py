@@ -9,9 +9,11 @@ from app.utils.validators import AssignmentValidator
 
 
 class AssignmentRepository:
+    # Валідатор без стану, один на всі екземпляри репозиторію
+    validator = AssignmentValidator()
+
     def __init__(self):
         self.table_name = "flight_assignments"
-        self.validator = AssignmentValidator()
         self.db_manager = DatabaseConfig()
     @log_database_operation
     def create_assignment(self, assignment_data: Dict[str, Any]) -> Optional[FlightAssignment]:
@@ -66,6 +68,25 @@ class AssignmentRepository:
         except psycopg2.Error as e:
             raise Exception(f"Database error finding assignment by id: {e}")
 
+    @log_database_operation
+    def find_flight_departure(self, assignment_id: int) -> Optional[Dict[str, Any]]:
+        """Отримання статусу призначення разом з часом відправлення його рейсу одним запитом"""
+        query = """
+                SELECT fa.id, fa.flight_id, fa.status, f.departure_time
+                FROM flight_assignments fa
+                         JOIN flights f ON fa.flight_id = f.id
+                WHERE fa.id = %s \
+                """
+
+        try:
+            with self.db_manager.get_connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                    cursor.execute(query, (assignment_id,))
+                    result = cursor.fetchone()
+                    return dict(result) if result else None
+        except psycopg2.Error as e:
+            raise Exception(f"Database error finding assignment flight: {e}")
+
     @log_database_operation
     def find_by_flight_id(self, flight_id: int) -> List[FlightAssignment]:
         """Пошук всіх призначень для рейсу"""
@@ -97,6 +118,46 @@ class AssignmentRepository:
         except psycopg2.Error as e:
             raise Exception(f"Database error finding assignments by flight: {e}")
 
+    @log_database_operation
+    def count_assigned_by_flight_ids(self, flight_ids: List[int]) -> Dict[int, int]:
+        """Кількість активних призначень для кожного з рейсів одним агрегатним запитом"""
+        if not flight_ids:
+            return {}
+
+        query = """
+                SELECT flight_id, COUNT(*) AS assigned_count
+                FROM flight_assignments
+                WHERE flight_id = ANY(%s) \
+                  AND status = 'ASSIGNED'
+                GROUP BY flight_id \
+                """
+
+        try:
+            with self.db_manager.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(query, (list(flight_ids),))
+                    return dict(cursor.fetchall())
+        except psycopg2.Error as e:
+            raise Exception(f"Database error counting flight assignments: {e}")
+
+    @log_database_operation
+    def has_active_assignments_for_flight(self, flight_id: int) -> bool:
+        """Перевірка наявності активних призначень на рейс без завантаження самих призначень"""
+        query = """
+                SELECT EXISTS (SELECT 1
+                               FROM flight_assignments
+                               WHERE flight_id = %s
+                                 AND status = 'ASSIGNED') \
+                """
+
+        try:
+            with self.db_manager.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(query, (flight_id,))
+                    return cursor.fetchone()[0]
+        except psycopg2.Error as e:
+            raise Exception(f"Database error checking assignments for flight: {e}")
+
     @log_database_operation
     def find_by_crew_member_id(self, crew_member_id: int) -> List[FlightAssignment]:
         """Пошук призначень для члена екіпажу"""
@@ -372,6 +433,25 @@ class AssignmentRepository:
         except psycopg2.Error as e:
             raise Exception(f"Database error getting flight crew statistics: {e}")
 
+    @log_database_operation
+    def get_status_summary(self, recent_since: datetime) -> List[Dict[str, Any]]:
+        """Кількість призначень за статусами, включно з призначеними після recent_since"""
+        query = """
+                SELECT status, \
+                       COUNT(*)                                         AS total, \
+                       COUNT(*) FILTER (WHERE assigned_at >= %s) AS recent
+                FROM flight_assignments
+                GROUP BY status \
+                """
+
+        try:
+            with self.db_manager.get_connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                    cursor.execute(query, (recent_since,))
+                    return [dict(row) for row in cursor.fetchall()]
+        except psycopg2.Error as e:
+            raise Exception(f"Database error getting assignment status summary: {e}")
+
     @log_database_operation
     def get_crew_member_workload(self, crew_member_id: int, start_date: datetime, end_date: datetime) -> Dict[str, Any]:
         """Отримання навантаження члена екіпажу за період"""
@@ -10,9 +10,10 @@ from app.utils.validators import CrewValidator
 
 
 class CrewRepository:
+    validator = CrewValidator()
+
     def __init__(self):
         self.table_name = "crew_members"
-        self.validator = CrewValidator()
         self.db_manager = DatabaseConfig()
 
     @log_database_operation
@@ -99,6 +100,26 @@ class CrewRepository:
         except psycopg2.Error as e:
             raise Exception(f"Database error finding available crew by position: {e}")
 
+    @log_database_operation
+    def find_all_available(self) -> List[CrewMember]:
+        """Пошук усіх доступних членів екіпажу з назвами посад одним запитом"""
+        query = """
+                SELECT cm.*, cp.position_name, cp.description as position_description
+                FROM crew_members cm
+                         JOIN crew_positions cp ON cm.position_id = cp.id
+                WHERE cm.is_available = TRUE
+                ORDER BY cm.position_id, cm.certification_level DESC, cm.experience_years DESC \
+                """
+
+        try:
+            with self.db_manager.get_connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                    cursor.execute(query)
+                    results = cursor.fetchall()
+                    return [CrewMember(**dict(row)) for row in results]
+        except psycopg2.Error as e:
+            raise Exception(f"Database error finding available crew: {e}")
+
     @log_database_operation
     def find_available_for_flight(self, departure_time: datetime, arrival_time: datetime) -> List[CrewMember]:
         """Пошук доступних членів екіпажу для рейсу"""
@@ -129,6 +150,35 @@ class CrewRepository:
         except psycopg2.Error as e:
             raise Exception(f"Database error finding available crew for flight: {e}")
 
+    @log_database_operation
+    def is_available_for_period(self, crew_id: int, departure_time: datetime, arrival_time: datetime) -> bool:
+        """Перевірка доступності одного члена екіпажу на період одним запитом"""
+        query = """
+                SELECT EXISTS (SELECT 1
+                               FROM crew_members cm
+                               WHERE cm.id = %s
+                                 AND cm.is_available = TRUE
+                                 AND NOT EXISTS (SELECT 1 \
+                                                 FROM flight_assignments fa \
+                                                          JOIN flights f ON fa.flight_id = f.id \
+                                                 WHERE fa.crew_member_id = cm.id \
+                                                   AND fa.status = 'ASSIGNED' \
+                                                   AND ( \
+                                                     (f.departure_time <= %s AND f.arrival_time >= %s) \
+                                                         OR (f.departure_time <= %s AND f.arrival_time >= %s) \
+                                                         OR (f.departure_time >= %s AND f.arrival_time <= %s) \
+                                                     ))) AS available \
+                """
+
+        try:
+            with self.db_manager.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(query, (crew_id, departure_time, departure_time, arrival_time, arrival_time,
+                                           departure_time, arrival_time))
+                    return cursor.fetchone()[0]
+        except psycopg2.Error as e:
+            raise Exception(f"Database error checking crew member availability: {e}")
+
     @log_database_operation
     def update_crew_member(self, crew_id: int, update_data: Dict[str, Any]) -> Optional[CrewMember]:
         """Оновлення даних члена екіпажу"""
@@ -164,6 +214,27 @@ class CrewRepository:
         except psycopg2.Error as e:
             raise Exception(f"Database error setting crew availability: {e}")
 
+    @log_database_operation
+    def get_position_statistics(self) -> List[Dict[str, Any]]:
+        """Кількість членів екіпажу (всього та доступних) по кожній посаді одним запитом"""
+        query = """
+                SELECT cp.position_name,
+                       COUNT(cm.id)                                  AS total_members,
+                       COUNT(cm.id) FILTER (WHERE cm.is_available) AS available_members
+                FROM crew_positions cp
+                         LEFT JOIN crew_members cm ON cm.position_id = cp.id
+                GROUP BY cp.id, cp.position_name
+                ORDER BY cp.position_name \
+                """
+
+        try:
+            with self.db_manager.get_connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                    cursor.execute(query)
+                    return [dict(row) for row in cursor.fetchall()]
+        except psycopg2.Error as e:
+            raise Exception(f"Database error getting crew position statistics: {e}")
+
     # Методи для роботи з посадами
     @log_database_operation
     def get_all_positions(self) -> List[CrewPosition]:
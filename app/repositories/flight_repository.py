@@ -1,28 +1,32 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from app.config.database import DatabaseConfig
 from app.config import log_database_operation
-from app.models import Flight
+from app.models import Flight, FlightAssignment
 from app.utils.validators import FlightValidator
 
 
 class FlightRepository:
+    # Списки рейсів будуються через Flight.model_construct: рядки з БД вже мають
+    # правильні типи, тож повторна валідація pydantic та копія dict(row) зайві
+    validator = FlightValidator()
+
     def __init__(self):
         self.table_name = "flights"
-        self.validator = FlightValidator()
         self.db_manager = DatabaseConfig()
     @log_database_operation
     def create_flight(self, flight_data: Dict[str, Any]) -> Optional[Flight]:
-        """Створення нового рейсу"""
+        """Створення нового рейсу. Повертає None, якщо рейс з таким номером вже існує"""
         self.validator.validate_flight_data(flight_data)
 
         query = """
                 INSERT INTO flights (flight_number, departure_city, arrival_city, departure_time,
                                      arrival_time, aircraft_type, status, crew_required, created_by)
-                VALUES (%(flight_number)s, %(departure_city)s, %(arrival_city)s, %(departure_time)s,
-                        %(arrival_time)s, %(aircraft_type)s, %(status)s, %(crew_required)s, %(created_by)s)
+                SELECT %(flight_number)s, %(departure_city)s, %(arrival_city)s, %(departure_time)s,
+                       %(arrival_time)s, %(aircraft_type)s, %(status)s, %(crew_required)s, %(created_by)s
+                WHERE NOT EXISTS (SELECT 1 FROM flights WHERE flight_number = %(flight_number)s)
                 RETURNING * \
                 """
 
@@ -50,6 +54,48 @@ class FlightRepository:
         except psycopg2.Error as e:
             raise Exception(f"Database error finding flight by id: {e}")
 
+    @log_database_operation
+    def find_with_assignments(self, flight_id: int) -> Optional[Tuple[Flight, List[FlightAssignment]]]:
+        """Пошук рейсу разом з його активними (ASSIGNED) призначеннями одним запитом"""
+        query = """
+                SELECT f.*, \
+                       COALESCE((SELECT json_agg(row_to_json(fa) ORDER BY cp.position_name, cm.last_name)
+                                 FROM flight_assignments fa
+                                          JOIN crew_members cm ON fa.crew_member_id = cm.id
+                                          JOIN crew_positions cp ON cm.position_id = cp.id
+                                 WHERE fa.flight_id = f.id
+                                   AND fa.status = 'ASSIGNED'), '[]'::json) AS assignments
+                FROM flights f
+                WHERE f.id = %s \
+                """
+
+        try:
+            with self.db_manager.get_connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                    cursor.execute(query, (flight_id,))
+                    result = cursor.fetchone()
+                    if not result:
+                        return None
+                    row = dict(result)
+                    assignments = [FlightAssignment(**assignment) for assignment in row.pop('assignments')]
+                    return Flight(**row), assignments
+        except psycopg2.Error as e:
+            raise Exception(f"Database error finding flight with assignments: {e}")
+
+    @log_database_operation
+    def find_status_by_id(self, flight_id: int) -> Optional[str]:
+        """Отримання лише статусу рейсу за ID"""
+        query = "SELECT status FROM flights WHERE id = %s"
+
+        try:
+            with self.db_manager.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(query, (flight_id,))
+                    result = cursor.fetchone()
+                    return result[0] if result else None
+        except psycopg2.Error as e:
+            raise Exception(f"Database error finding flight status: {e}")
+
     @log_database_operation
     def find_by_flight_number(self, flight_number: str) -> Optional[Flight]:
         """Пошук рейсу за номером"""
@@ -82,7 +128,7 @@ class FlightRepository:
                 with conn.cursor(cursor_factory=RealDictCursor) as cursor:
                     cursor.execute(query, (start_date, end_date))
                     results = cursor.fetchall()
-                    return [Flight(**dict(row)) for row in results]
+                    return [Flight.model_construct(**row) for row in results]
         except psycopg2.Error as e:
             raise Exception(f"Database error finding flights by date range: {e}")
 
@@ -96,22 +142,23 @@ class FlightRepository:
                 with conn.cursor(cursor_factory=RealDictCursor) as cursor:
                     cursor.execute(query, (status,))
                     results = cursor.fetchall()
-                    return [Flight(**dict(row)) for row in results]
+                    return [Flight.model_construct(**row) for row in results]
         except psycopg2.Error as e:
             raise Exception(f"Database error finding flights by status: {e}")
 
     @log_database_operation
     def find_flights_needing_crew(self) -> List[Flight]:
         """Пошук рейсів, які потребують екіпаж"""
+        # Рахуються лише призначення запланованих рейсів, а не агрегат
+        # по всій таблиці призначень з подальшим відкиданням зайвих рейсів
         query = """
                 SELECT f.* \
                 FROM flights f \
-                         LEFT JOIN (SELECT flight_id, COUNT(*) as assigned_count \
-                                    FROM flight_assignments \
-                                    WHERE status = 'ASSIGNED' \
-                                    GROUP BY flight_id) fa ON f.id = fa.flight_id
-                WHERE COALESCE(fa.assigned_count, 0) < f.crew_required
-                  AND f.status = 'SCHEDULED'
+                         LEFT JOIN flight_assignments fa ON fa.flight_id = f.id \
+                    AND fa.status = 'ASSIGNED'
+                WHERE f.status = 'SCHEDULED'
+                GROUP BY f.id
+                HAVING COUNT(fa.id) < f.crew_required
                 ORDER BY f.departure_time \
                 """
 
@@ -120,18 +167,23 @@ class FlightRepository:
                 with conn.cursor(cursor_factory=RealDictCursor) as cursor:
                     cursor.execute(query)
                     results = cursor.fetchall()
-                    return [Flight(**dict(row)) for row in results]
+                    return [Flight.model_construct(**row) for row in results]
         except psycopg2.Error as e:
             raise Exception(f"Database error finding flights needing crew: {e}")
 
     @log_database_operation
     def update_flight(self, flight_id: int, update_data: Dict[str, Any]) -> Optional[Flight]:
-        """Оновлення рейсу"""
+        """Оновлення рейсу. Повертає None, якщо рейс не знайдено або новий номер рейсу вже зайнятий"""
         if not update_data:
             return self.find_by_id(flight_id)
 
         set_clause = ", ".join([f"{key} = %({key})s" for key in update_data.keys()])
-        query = f"UPDATE flights SET {set_clause}, updated_at = CURRENT_TIMESTAMP WHERE id = %(id)s RETURNING *"
+        where_clause = "id = %(id)s"
+        if 'flight_number' in update_data:
+            # Унікальність номера перевіряється в самому UPDATE
+            where_clause += (" AND NOT EXISTS (SELECT 1 FROM flights"
+                             " WHERE flight_number = %(flight_number)s AND id <> %(id)s)")
+        query = f"UPDATE flights SET {set_clause}, updated_at = CURRENT_TIMESTAMP WHERE {where_clause} RETURNING *"
 
         update_data['id'] = flight_id
 
@@ -146,19 +198,75 @@ class FlightRepository:
             raise Exception(f"Database error updating flight: {e}")
 
     @log_database_operation
-    def update_flight_status(self, flight_id: int, status: str) -> bool:
-        """Оновлення статусу рейсу"""
+    def update_flight_status(self, flight_id: int, status: str,
+                             from_statuses: Optional[List[str]] = None) -> Optional[Flight]:
+        """Оновлення статусу рейсу.
+
+        Якщо передано from_statuses, рядок оновлюється лише коли поточний статус
+        входить до них, і тоді None означає також недопустимий перехід.
+        """
         query = "UPDATE flights SET status = %s, updated_at = CURRENT_TIMESTAMP WHERE id = %s"
+        params = [status, flight_id]
+        if from_statuses is not None:
+            query += " AND status = ANY(%s)"
+            params.append(list(from_statuses))
+        query += " RETURNING *"
 
         try:
             with self.db_manager.get_connection() as conn:
-                with conn.cursor() as cursor:
-                    cursor.execute(query, (status, flight_id))
+                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                    cursor.execute(query, params)
+                    result = cursor.fetchone()
                     conn.commit()
-                    return cursor.rowcount > 0
+                    return Flight(**dict(result)) if result else None
         except psycopg2.Error as e:
             raise Exception(f"Database error updating flight status: {e}")
 
+    @log_database_operation
+    def cancel_flight(self, flight_id: int, from_statuses: List[str],
+                      notes: Optional[str] = None) -> Tuple[Optional[Flight], int]:
+        """Скасування рейсу разом з усіма його активними призначеннями.
+
+        Обидва оновлення виконуються одним запитом, тому вони атомарні: рейс не
+        може залишитись скасованим з активними призначеннями. Повертає оновлений
+        рейс (None, якщо рейс не знайдено або перехід недопустимий) та кількість
+        скасованих призначень.
+        """
+        query = """
+                WITH cancelled_flight AS (
+                    UPDATE flights
+                    SET status = 'CANCELLED', updated_at = CURRENT_TIMESTAMP
+                    WHERE id = %(flight_id)s AND status = ANY(%(from_statuses)s)
+                    RETURNING *),
+                     cancelled_assignments AS (
+                         UPDATE flight_assignments
+                         SET status     = 'CANCELLED', \
+                             notes      = COALESCE(%(notes)s, notes), \
+                             updated_at = CURRENT_TIMESTAMP
+                         WHERE flight_id IN (SELECT id FROM cancelled_flight) \
+                           AND status = 'ASSIGNED'
+                         RETURNING 1)
+                SELECT cancelled_flight.*, \
+                       (SELECT COUNT(*) FROM cancelled_assignments) AS cancelled_assignments_count
+                FROM cancelled_flight \
+                """
+
+        params = {'flight_id': flight_id, 'from_statuses': list(from_statuses), 'notes': notes}
+
+        try:
+            with self.db_manager.get_connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                    cursor.execute(query, params)
+                    result = cursor.fetchone()
+                    conn.commit()
+                    if not result:
+                        return None, 0
+                    row = dict(result)
+                    cancelled_count = row.pop('cancelled_assignments_count')
+                    return Flight(**row), cancelled_count
+        except psycopg2.Error as e:
+            raise Exception(f"Database error cancelling flight: {e}")
+
     @log_database_operation
     def delete_flight(self, flight_id: int) -> bool:
         """Видалення рейсу"""
@@ -1,16 +1,17 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from app.config.database import DatabaseConfig
 from app.config import log_database_operation
-from app.models.user import User
+from app.models.user import User, UserRole
 from app.utils.validators import UserValidator
 
 
 class UserRepository:
+    validator = UserValidator()
+
     def __init__(self):
         self.table_name = "users"
-        self.validator = UserValidator()
         self.db_manager = DatabaseConfig()
     @log_database_operation
     def create_user(self, user_data: Dict[str, Any]) -> Optional[User]:
@@ -64,6 +65,57 @@ class UserRepository:
         except psycopg2.Error as e:
             raise Exception(f"Database error finding user by keycloak_id: {e}")
 
+    @log_database_operation
+    def upsert_by_keycloak_id(self, user_data: Dict[str, Any]) -> Tuple[User, bool, bool]:
+        """Створення або оновлення користувача за Keycloak ID одним запитом.
+
+        Повертає користувача, ознаку чи він був щойно створений та ознаку чи
+        запис змінився. Якщо дані не відрізняються від збережених, рядок не
+        перезаписується. Логін та статус активності існуючого користувача не
+        змінюються, а порожні значення не затирають збережені.
+        """
+        self.validator.validate_user_data(user_data)
+
+        # Для незмінних даних ON CONFLICT нічого не оновлює і не повертає,
+        # тоді поточний рядок береться зі знімка, який бачить той самий запит
+        query = """
+                WITH upserted AS (
+                    INSERT INTO users (keycloak_id, username, email, first_name, last_name, role, is_active)
+                    VALUES (%(keycloak_id)s, %(username)s, %(email)s, %(first_name)s, %(last_name)s, %(role)s, \
+                            %(is_active)s)
+                    ON CONFLICT (keycloak_id) DO UPDATE SET
+                        email = COALESCE(NULLIF(EXCLUDED.email, ''), users.email),
+                        first_name = COALESCE(NULLIF(EXCLUDED.first_name, ''), users.first_name),
+                        last_name = COALESCE(NULLIF(EXCLUDED.last_name, ''), users.last_name),
+                        role = EXCLUDED.role,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE (users.email, users.first_name, users.last_name, users.role)
+                          IS DISTINCT FROM
+                          (COALESCE(NULLIF(EXCLUDED.email, ''), users.email),
+                           COALESCE(NULLIF(EXCLUDED.first_name, ''), users.first_name),
+                           COALESCE(NULLIF(EXCLUDED.last_name, ''), users.last_name),
+                           EXCLUDED.role)
+                    RETURNING *, (xmax = 0) AS was_created, TRUE AS was_changed
+                )
+                SELECT * FROM upserted
+                UNION ALL
+                SELECT users.*, FALSE AS was_created, FALSE AS was_changed
+                FROM users
+                WHERE keycloak_id = %(keycloak_id)s AND NOT EXISTS (SELECT 1 FROM upserted) \
+                """
+
+        try:
+            with self.db_manager.get_connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                    cursor.execute(query, user_data)
+                    result = dict(cursor.fetchone())
+                    conn.commit()
+                    was_created = result.pop('was_created')
+                    was_changed = result.pop('was_changed')
+                    return User(**result), was_created, was_changed
+        except psycopg2.Error as e:
+            raise Exception(f"Database error upserting user: {e}")
+
     @log_database_operation
     def find_by_username(self, username: str) -> Optional[User]:
         """Пошук користувача за логіном"""
@@ -115,6 +167,41 @@ class UserRepository:
         except psycopg2.Error as e:
             raise Exception(f"Database error updating user: {e}")
 
+    @log_database_operation
+    def set_user_active_as_admin(self, user_id: int, is_active: bool,
+                                 admin_id: int) -> Tuple[bool, Optional[User]]:
+        """
+        Зміна статусу активності користувача від імені адміністратора
+
+        Перевірка, що admin_id належить активному адміністратору, виконується
+        в тому ж запиті, що й оновлення. Повертає (чи має адміністратор права,
+        оновлений користувач або None якщо оновлення не відбулося).
+        """
+        query = """
+                WITH admin_ok AS (
+                    SELECT EXISTS (SELECT 1 FROM users WHERE id = %s AND role = %s AND is_active) AS ok
+                ),
+                updated AS (
+                    UPDATE users SET is_active = %s, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = %s AND (SELECT ok FROM admin_ok)
+                    RETURNING *
+                )
+                SELECT admin_ok.ok AS admin_ok, updated.*
+                FROM admin_ok
+                         LEFT JOIN updated ON TRUE \
+                """
+
+        try:
+            with self.db_manager.get_connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                    cursor.execute(query, (admin_id, UserRole.ADMIN.value, is_active, user_id))
+                    row = dict(cursor.fetchone())
+                    conn.commit()
+                    admin_ok = row.pop('admin_ok')
+                    return admin_ok, User(**row) if row['id'] is not None else None
+        except psycopg2.Error as e:
+            raise Exception(f"Database error changing user status: {e}")
+
     @log_database_operation
     def deactivate_user(self, user_id: int) -> bool:
         """Деактивація користувача"""
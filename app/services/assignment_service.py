@@ -1,3 +1,4 @@
+from collections import defaultdict
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 import logging
@@ -13,16 +14,24 @@ from app.config.logging_config import log_info, log_error, log_warning
 
 logger = logging.getLogger(__name__)
 
+# Таблиці статусів та посад, будуються один раз при імпорті
+VALID_ASSIGNMENT_STATUSES = frozenset({'ASSIGNED', 'CONFIRMED', 'CANCELLED'})
+ACTIVE_ASSIGNMENT_STATUSES = frozenset({'ASSIGNED', 'CONFIRMED'})
+_UPDATABLE_ASSIGNMENT_FIELDS = frozenset({'status', 'notes'})
+# Пріоритетний порядок призначення посад при автоматичному призначенні
+_AUTO_ASSIGN_POSITION_PRIORITY = ('PILOT', 'CO_PILOT', 'NAVIGATOR', 'RADIO_OPERATOR', 'FLIGHT_ATTENDANT')
+
 
 class AssignmentService:
     """Сервіс для управління призначеннями екіпажу на рейси"""
+    # Спільні для всіх екземплярів: не зберігають стану між викликами
+    assignment_mapper = FlightAssignmentMapper()
+    validator = AssignmentValidator()
 
     def __init__(self):
         self.assignment_repository = AssignmentRepository()
         self.crew_repository = CrewRepository()
         self.flight_repository = FlightRepository()
-        self.assignment_mapper = FlightAssignmentMapper()
-        self.validator = AssignmentValidator()
 
     def create_assignment(self, assignment_data: Dict[str, Any], assigned_by_user_id: int) -> FlightAssignment:
         """
@@ -55,31 +64,7 @@ class AssignmentService:
             if not crew_member:
                 raise ValueError(f"Член екіпажу з ID {crew_member_id} не знайдено")
 
-            # Перевірка доступності члена екіпажу
-            if not crew_member.is_available:
-                raise ValueError(f"Член екіпажу {crew_member.first_name} {crew_member.last_name} недоступний")
-
-            # Перевірка конфліктів розкладу
-            if not self._check_schedule_conflicts(crew_member_id, flight.departure_time, flight.arrival_time):
-                raise ValueError("Член екіпажу вже призначений на інший рейс у цей час")
-
-            # Перевірка, чи не перевищено максимальну кількість екіпажу для рейсу
-            current_assignments = self.assignment_repository.find_by_flight_id(flight_id)
-            if len(current_assignments) >= flight.crew_required * 2:  # Максимум у 2 рази більше необхідного
-                raise ValueError("Перевищено максимальну кількість екіпажу для рейсу")
-
-            # Додавання системних полів
-            assignment_data['assigned_by'] = assigned_by_user_id
-            assignment_data['assigned_at'] = datetime.now()
-            assignment_data['status'] = assignment_data.get('status', 'ASSIGNED')
-
-            # Створення призначення
-            assignment_id = self.assignment_repository.create_assignment(assignment_data)
-            created_assignment = self.assignment_repository.find_by_id(assignment_id)
-
-            log_info(f"Створено призначення {assignment_id} для екіпажу {crew_member_id} на рейс {flight_id}")
-
-            return created_assignment
+            return self._create_assignment_for(assignment_data, assigned_by_user_id, flight, crew_member)
 
         except ValidationError as e:
             log_error(f"Помилка валідації при створенні призначення: {str(e)}")
@@ -88,6 +73,54 @@ class AssignmentService:
             log_error(f"Помилка при створенні призначення: {str(e)}")
             raise
 
+    def _create_assignment_for(self, assignment_data: Dict[str, Any], assigned_by_user_id: int,
+                               flight: Any, crew_member: CrewMember,
+                               assignment_count: Optional[int] = None,
+                               assigned_at: Optional[datetime] = None) -> FlightAssignment:
+        """
+        Створення призначення для вже завантажених рейсу та члена екіпажу
+
+        Args:
+            assignment_data: Дані призначення
+            assigned_by_user_id: ID користувача, який створює призначення
+            flight: Рейс
+            crew_member: Член екіпажу
+            assignment_count: Поточна кількість призначень на рейс, якщо вже відома
+            assigned_at: Час призначення, якщо вже отриманий викликачем
+
+        Returns:
+            FlightAssignment: Створене призначення
+        """
+        flight_id = flight.id
+        crew_member_id = crew_member.id
+
+        # Перевірка доступності члена екіпажу
+        if not crew_member.is_available:
+            raise ValueError(f"Член екіпажу {crew_member.first_name} {crew_member.last_name} недоступний")
+
+        # Перевірка конфліктів розкладу
+        if not self._check_schedule_conflicts(crew_member_id, flight.departure_time, flight.arrival_time):
+            raise ValueError("Член екіпажу вже призначений на інший рейс у цей час")
+
+        # Перевірка, чи не перевищено максимальну кількість екіпажу для рейсу
+        if assignment_count is None:
+            assignment_count = len(self.assignment_repository.find_by_flight_id(flight_id))
+        if assignment_count >= flight.crew_required * 2:  # Максимум у 2 рази більше необхідного
+            raise ValueError("Перевищено максимальну кількість екіпажу для рейсу")
+
+        # Додавання системних полів
+        assignment_data['assigned_by'] = assigned_by_user_id
+        assignment_data['assigned_at'] = assigned_at or datetime.now()
+        assignment_data['status'] = assignment_data.get('status', 'ASSIGNED')
+
+        # Створення призначення
+        assignment_id = self.assignment_repository.create_assignment(assignment_data)
+        created_assignment = self.assignment_repository.find_by_id(assignment_id)
+
+        log_info(f"Створено призначення {assignment_id} для екіпажу {crew_member_id} на рейс {flight_id}")
+
+        return created_assignment
+
     def get_assignment_by_id(self, assignment_id: int) -> Optional[FlightAssignment]:
         """Отримання призначення за ID"""
         try:
@@ -147,11 +180,10 @@ class AssignmentService:
                 raise ValueError(f"Призначення з ID {assignment_id} не знайдено")
 
             # Валідація даних оновлення
-            allowed_fields = ['status', 'notes']
-            filtered_data = {k: v for k, v in update_data.items() if k in allowed_fields}
+            filtered_data = {k: v for k, v in update_data.items() if k in _UPDATABLE_ASSIGNMENT_FIELDS}
 
             if 'status' in filtered_data:
-                if filtered_data['status'] not in ['ASSIGNED', 'CONFIRMED', 'CANCELLED']:
+                if filtered_data['status'] not in VALID_ASSIGNMENT_STATUSES:
                     raise ValidationError("Невалідний статус призначення")
 
             # Оновлення
@@ -216,13 +248,13 @@ class AssignmentService:
             bool: True якщо успішно видалено
         """
         try:
-            existing_assignment = self.assignment_repository.find_by_id(assignment_id)
+            # Призначення та час відправлення рейсу отримуються одним запитом
+            existing_assignment = self.assignment_repository.find_flight_departure(assignment_id)
             if not existing_assignment:
                 raise ValueError(f"Призначення з ID {assignment_id} не знайдено")
 
             # Перевірка чи можна видаляти (наприклад, тільки скасовані або майбутні)
-            flight = self.flight_repository.find_by_id(existing_assignment.flight_id)
-            if flight and flight.departure_time <= datetime.now():
+            if existing_assignment['departure_time'] <= datetime.now():
                 raise ValueError("Неможливо видалити призначення для рейсу, що вже відбувся або відбувається")
 
             self.assignment_repository.delete_assignment(assignment_id)
@@ -304,19 +336,8 @@ class AssignmentService:
             if not flight:
                 raise ValueError(f"Рейс з ID {flight_id} не знайдено")
 
-            # Отримання всіх доступних членів екіпажу
-            available_crew = self.crew_repository.find_available_for_flight(
-                flight.departure_time,
-                flight.arrival_time
-            )
-
-            # Фільтрування тих, хто вже призначений на цей рейс
             current_assignments = self.assignment_repository.find_by_flight_id(flight_id)
-            assigned_crew_ids = {assignment.crew_member_id for assignment in current_assignments
-                                 if assignment.status in ['ASSIGNED', 'CONFIRMED']}
-
-            available_crew = [crew for crew in available_crew
-                              if crew.id not in assigned_crew_ids]
+            available_crew = self._available_crew_for(flight, current_assignments)
 
             log_info(f"Знайдено {len(available_crew)} доступних членів екіпажу для рейсу {flight_id}")
 
@@ -326,6 +347,21 @@ class AssignmentService:
             log_error(f"Помилка при отриманні доступного екіпажу для рейсу {flight_id}: {str(e)}")
             raise
 
+    def _available_crew_for(self, flight: Any, current_assignments: List[FlightAssignment]) -> List[CrewMember]:
+        """Доступні члени екіпажу для вже завантажених рейсу та його призначень"""
+        # Отримання всіх доступних членів екіпажу
+        available_crew = self.crew_repository.find_available_for_flight(
+            flight.departure_time,
+            flight.arrival_time
+        )
+
+        # Фільтрування тих, хто вже призначений на цей рейс
+        assigned_crew_ids = {assignment.crew_member_id for assignment in current_assignments
+                             if assignment.status in ACTIVE_ASSIGNMENT_STATUSES}
+
+        return [crew for crew in available_crew
+                if crew.id not in assigned_crew_ids]
+
     def auto_assign_crew(self, flight_id: int, assigned_by_user_id: int) -> List[FlightAssignment]:
         """
         Автоматичне призначення екіпажу на рейс
@@ -344,45 +380,41 @@ class AssignmentService:
 
             # Перевірка чи рейс потребує екіпажу
             current_assignments = self.assignment_repository.find_by_flight_id(flight_id)
-            active_assignments = [a for a in current_assignments if a.status in ['ASSIGNED', 'CONFIRMED']]
+            active_assignments = [a for a in current_assignments if a.status in ACTIVE_ASSIGNMENT_STATUSES]
 
             if len(active_assignments) >= flight.crew_required:
                 log_warning(f"Рейс {flight_id} вже має достатньо екіпажу")
                 return active_assignments
 
-            # Отримання доступного екіпажу
-            available_crew = self.get_available_crew_for_flight(flight_id)
+            # Отримання доступного екіпажу; рейс і його призначення вже завантажені,
+            # тому не читаємо їх повторно через get_available_crew_for_flight
+            available_crew = self._available_crew_for(flight, current_assignments)
 
             if not available_crew:
                 raise ValueError("Немає доступного екіпажу для автоматичного призначення")
 
-            # Групування за посадами
-            crew_by_position = {}
+            # Групування за посадами за один прохід
+            crew_by_position = defaultdict(list)
             for crew_member in available_crew:
-                position_name = crew_member.position_name if hasattr(crew_member, 'position_name') else 'UNKNOWN'
-                if position_name not in crew_by_position:
-                    crew_by_position[position_name] = []
-                crew_by_position[position_name].append(crew_member)
-
-            # Пріоритетний порядок призначення посад
-            priority_positions = ['PILOT', 'CO_PILOT', 'NAVIGATOR', 'RADIO_OPERATOR', 'FLIGHT_ATTENDANT']
+                crew_by_position[getattr(crew_member, 'position_name', 'UNKNOWN')].append(crew_member)
 
             created_assignments = []
             needed_crew = flight.crew_required - len(active_assignments)
+            # Один час призначення на всю пачку замість datetime.now() для кожного
+            assigned_at = datetime.now()
 
-            for position in priority_positions:
+            for position in _AUTO_ASSIGN_POSITION_PRIORITY:
                 if needed_crew <= 0:
                     break
 
-                if position in crew_by_position and crew_by_position[position]:
-                    # Сортування за досвідом (спочатку більш досвідчені)
-                    crew_by_position[position].sort(
-                        key=lambda x: (x.experience_years, x.certification_level == 'CAPTAIN'),
-                        reverse=True
+                candidates = crew_by_position.get(position)
+                if candidates:
+                    # Потрібен лише найдосвідченіший кандидат, тому max замість повного сортування
+                    crew_member = max(
+                        candidates,
+                        key=lambda x: (x.experience_years, x.certification_level == 'CAPTAIN')
                     )
 
-                    crew_member = crew_by_position[position][0]
-
                     assignment_data = {
                         'flight_id': flight_id,
                         'crew_member_id': crew_member.id,
@@ -390,7 +422,16 @@ class AssignmentService:
                         'notes': f'Автоматично призначено ({position})'
                     }
 
-                    assignment = self.create_assignment(assignment_data, assigned_by_user_id)
+                    # Призначення створюються послідовно: перевірки конфліктів і
+                    # кількості екіпажу мають бачити попередні вставки, а при помилці
+                    # наступні призначення не створюються. Рейс, член екіпажу та
+                    # кількість призначень вже відомі, тому не завантажуємо їх повторно
+                    self.validator.validate_assignment_data(assignment_data)
+                    assignment = self._create_assignment_for(
+                        assignment_data, assigned_by_user_id, flight, crew_member,
+                        assignment_count=len(current_assignments) + len(created_assignments),
+                        assigned_at=assigned_at
+                    )
                     created_assignments.append(assignment)
                     needed_crew -= 1
 
@@ -425,26 +466,17 @@ class AssignmentService:
     def get_assignment_summary(self) -> Dict[str, Any]:
         """Отримання загальної інформації про призначення"""
         try:
-            all_assignments = self.assignment_repository.get_all_assignments()
+            # Статистика за статусами та призначення за останні 7 днів
+            # рахуються в БД одним агрегатним запитом замість завантаження всіх рядків
+            week_ago = datetime.now() - timedelta(days=7)
+            status_rows = self.assignment_repository.get_status_summary(week_ago)
 
             summary = {
-                'total_assignments': len(all_assignments),
-                'by_status': {},
-                'recent_assignments': 0
+                'total_assignments': sum(row['total'] for row in status_rows),
+                'by_status': {row['status']: row['total'] for row in status_rows},
+                'recent_assignments': sum(row['recent'] for row in status_rows)
             }
 
-            # Статистика за статусами
-            for assignment in all_assignments:
-                status = assignment.status
-                summary['by_status'][status] = summary['by_status'].get(status, 0) + 1
-
-            # Призначення за останні 7 днів
-            week_ago = datetime.now() - timedelta(days=7)
-            summary['recent_assignments'] = len([
-                a for a in all_assignments
-                if a.assigned_at and a.assigned_at >= week_ago
-            ])
-
             log_info("Отримано загальну інформацію про призначення")
 
             return summary
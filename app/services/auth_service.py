@@ -1,14 +1,38 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Union
+from functools import lru_cache
 import logging
 
 from app.models.user import User, UserRole
 from app.config import KeycloakClient
 from app.repositories import UserRepository
+from app.utils.cache import TTLCache
 from app.utils.jwt_utils import JWTManager, KeycloakJWTManager
+from app.utils.keycloak_roles import extract_role_from_keycloak
+from app.utils.mappers import UserMapper
 from app.utils.validators import UserValidator, ValidationError
 from app.config import log_auth_event, log_error, log_info
 
 
+# Ролі, доступ до яких має кожна роль користувача
+_ROLE_GRANTS = {
+    UserRole.ADMIN.value: frozenset({UserRole.ADMIN.value, UserRole.DISPATCHER.value}),
+    UserRole.DISPATCHER.value: frozenset({UserRole.DISPATCHER.value}),
+}
+_NO_GRANTS = frozenset()
+
+# Поля користувача, що потрапляють у claims access токена
+_TOKEN_CLAIM_FIELDS = {'id', 'username', 'email', 'role', 'keycloak_id'}
+
+
+@lru_cache(maxsize=16)
+def _role_or_none(value: str) -> Optional[UserRole]:
+    """Перетворення рядка на UserRole без винятку для недопустимих значень"""
+    try:
+        return UserRole(value)
+    except ValueError:
+        return None
+
+
 class AuthenticationError(Exception):
     """Виняток для помилок автентифікації"""
     pass
@@ -20,6 +44,16 @@ class AuthorizationError(Exception):
 
 
 class AuthService:
+    # Час життя закешованого профілю користувача (секунди)
+    USER_CACHE_TTL = 60
+    # Логер спільний для всіх екземплярів: getLogger бере глобальний lock
+    # модуля logging, а сервіс створюється на кожен запит
+    logger = logging.getLogger(__name__)
+    # Профілі користувачів за ID, які читаються на кожен автентифікований запит.
+    # Кеш належить класу: сервіс створюється на кожен запит, а кеш має
+    # переживати запити і спільно інвалідуватися з усіх екземплярів
+    _user_cache = TTLCache(ttl_seconds=USER_CACHE_TTL, max_size=10000)
+
     def __init__(self,
                  keycloak_client: KeycloakClient,
                  user_repository: UserRepository,
@@ -29,7 +63,52 @@ class AuthService:
         self.user_repository = user_repository
         self.jwt_manager = jwt_manager
         self.keycloak_jwt_manager = keycloak_jwt_manager
-        self.logger = logging.getLogger(__name__)
+
+    def get_user_by_id(self, user_id: int) -> Optional[User]:
+        """
+        Отримання користувача за ID з кешу або БД
+
+        Args:
+            user_id: ID користувача
+
+        Returns:
+            User об'єкт або None
+        """
+        user = self._user_cache.get(user_id)
+        if user is None:
+            user = self.user_repository.find_by_id(user_id)
+            if user:
+                self._user_cache.set(user_id, user)
+        return user
+
+    def invalidate_user_cache(self, user_id: int) -> None:
+        """Видалення профілю користувача з кешу після зміни даних"""
+        self._user_cache.invalidate(user_id)
+
+    def get_user_profile(self, user_id: int, include_keycloak: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Отримання профілю користувача
+
+        Args:
+            user_id: ID користувача
+            include_keycloak: Чи додавати дані облікового запису з Keycloak Admin API
+
+        Returns:
+            Словник з user та keycloak_data або None якщо користувача не знайдено
+        """
+        user = self.get_user_by_id(user_id)
+        if not user:
+            return None
+
+        # Запит до Admin API виконується лише на явну вимогу
+        keycloak_data = None
+        if include_keycloak and user.keycloak_id:
+            try:
+                keycloak_data = self.keycloak_client.get_user_by_keycloak_id(user.keycloak_id)
+            except Exception as e:
+                log_error(f"Не вдалося отримати дані Keycloak для користувача {user_id}: {str(e)}")
+
+        return {'user': user, 'keycloak_data': keycloak_data}
 
     def login(self, username: str, password: str) -> Dict[str, Any]:
         """
@@ -66,7 +145,8 @@ class AuthService:
                 raise AuthenticationError("Обліковий запис деактивовано")
 
             # Створюємо локальні JWT токени
-            access_token = self.jwt_manager.create_access_token(user.id, user.role.value)
+            access_token, expires_in = self.jwt_manager.create_access_token_with_expiry(
+                user.model_dump(include=_TOKEN_CLAIM_FIELDS))
             refresh_token = self.jwt_manager.create_refresh_token(user.id)
 
             log_auth_event(f"Успішний вхід користувача: {username}")
@@ -75,8 +155,8 @@ class AuthService:
                 'access_token': access_token,
                 'refresh_token': refresh_token,
                 'keycloak_token': token_response['access_token'],
-                'user': user.to_dict(),
-                'expires_in': self.jwt_manager.get_token_expiry(access_token)
+                'user': UserMapper.to_dict(user),
+                'expires_in': expires_in
             }
 
         except Exception as e:
@@ -100,9 +180,10 @@ class AuthService:
 
             log_auth_event(f"Вихід користувача: {username}")
 
-            # Відкликаємо токен в Keycloak якщо є
+            # Відкликаємо токен в Keycloak якщо є; результат не впливає на відповідь,
+            # тому запит до Keycloak виконується у фоні
             if keycloak_token:
-                self.keycloak_client.logout_user(keycloak_token)
+                self.keycloak_client.logout_user_in_background(keycloak_token)
 
             log_info(f"Успішний вихід користувача: {username}")
             return True
@@ -132,17 +213,18 @@ class AuthService:
             if not user_info:
                 raise AuthenticationError("Не вдалося отримати інформацію з токена")
 
-            user = self.user_repository.find_by_id(user_info['user_id'])
+            user = self.get_user_by_id(int(user_info['id']))
             if not user or not user.is_active:
                 raise AuthenticationError("Користувач не знайдений або деактивований")
 
-            new_access_token = self.jwt_manager.create_access_token(user.id, user.role.value)
+            new_access_token, expires_in = self.jwt_manager.create_access_token_with_expiry(
+                user.model_dump(include=_TOKEN_CLAIM_FIELDS))
 
             log_auth_event(f"Оновлення токена для користувача: {user.username}")
 
             return {
                 'access_token': new_access_token,
-                'expires_in': self.jwt_manager.get_token_expiry(new_access_token)
+                'expires_in': expires_in
             }
 
         except Exception as e:
@@ -167,7 +249,7 @@ class AuthService:
             if not user_info:
                 return None
 
-            user = self.user_repository.find_by_id(user_info['user_id'])
+            user = self.get_user_by_id(int(user_info['id']))
             if not user or not user.is_active:
                 return None
 
@@ -193,13 +275,13 @@ class AuthService:
             log_error(f"Помилка валідації Keycloak токена: {str(e)}")
             return None
 
-    def check_permission(self, user: User, required_role: UserRole) -> bool:
+    def check_permission(self, user: User, required_role: Union[UserRole, str]) -> bool:
         """
         Перевірка прав доступу користувача
 
         Args:
             user: Користувач
-            required_role: Необхідна роль
+            required_role: Необхідна роль (UserRole або її рядкове значення)
 
         Returns:
             True якщо користувач має необхідні права
@@ -207,12 +289,12 @@ class AuthService:
         if not user or not user.is_active:
             return False
 
-        # Адміністратор має доступ до всього
-        if user.is_admin():
-            return True
+        required_role = _role_or_none(required_role)
+        if required_role is None:
+            return False
 
-        # Перевіряємо відповідність ролі
-        return user.role == required_role
+        # Адміністратор має доступ до всього, інші ролі - лише до своєї
+        return required_role.value in _ROLE_GRANTS.get(user.role, _NO_GRANTS)
 
     def create_user_from_keycloak(self, keycloak_user_data: Dict[str, Any]) -> User:
         """
@@ -234,7 +316,7 @@ class AuthService:
             UserValidator.validate_email(keycloak_user_data.get('email', ''))
 
             # Визначаємо роль на основі Keycloak ролей
-            role = self._extract_role_from_keycloak(keycloak_user_data)
+            role = extract_role_from_keycloak(keycloak_user_data)
 
             user_data = {
                 'keycloak_id': keycloak_user_data['sub'],
@@ -275,58 +357,26 @@ class AuthService:
         if not keycloak_id:
             raise AuthenticationError("Відсутній Keycloak ID")
 
-        # Шукаємо існуючого користувача
-        user = self.user_repository.find_by_keycloak_id(keycloak_id)
-
-        if user:
-            # Оновлюємо існуючого користувача
-            user.email = keycloak_user_info.get('email', user.email)
-            user.first_name = keycloak_user_info.get('given_name', user.first_name)
-            user.last_name = keycloak_user_info.get('family_name', user.last_name)
-
-            # Оновлюємо роль якщо змінилася
-            new_role = self._extract_role_from_keycloak(keycloak_user_info)
-            if new_role != user.role:
-                user.role = new_role
-                log_info(f"Оновлено роль користувача {user.username}: {new_role.value}")
-
-            self.user_repository.update_user(user)
-            return user
-        else:
-            # Створюємо нового користувача
-            return self.create_user_from_keycloak(keycloak_user_info)
-
-    def _extract_role_from_keycloak(self, keycloak_data: Dict[str, Any]) -> UserRole:
-        """
-        Витягує роль користувача з даних Keycloak
+        user_data = {
+            'keycloak_id': keycloak_id,
+            'username': keycloak_user_info.get('preferred_username', ''),
+            'email': keycloak_user_info.get('email', ''),
+            'first_name': keycloak_user_info.get('given_name', ''),
+            'last_name': keycloak_user_info.get('family_name', ''),
+            'role': extract_role_from_keycloak(keycloak_user_info).value,
+            'is_active': True
+        }
+
+        # Один INSERT ... ON CONFLICT замість пошуку та окремого створення/оновлення;
+        # якщо дані в Keycloak не змінилися, запис у БД не перезаписується
+        user, was_created, was_changed = self.user_repository.upsert_by_keycloak_id(user_data)
+
+        if was_created:
+            log_info(f"Створено нового користувача з Keycloak: {user.username}")
+        elif was_changed:
+            self.invalidate_user_cache(user.id)
 
-        Args:
-            keycloak_data: Дані з Keycloak
-
-        Returns:
-            UserRole
-        """
-        # Перевіряємо ролі в різних можливих місцях
-        roles = []
-
-        # Ролі можуть бути в realm_access
-        if 'realm_access' in keycloak_data and 'roles' in keycloak_data['realm_access']:
-            roles.extend(keycloak_data['realm_access']['roles'])
-
-        # Ролі можуть бути в resource_access
-        if 'resource_access' in keycloak_data:
-            for client, access in keycloak_data['resource_access'].items():
-                if 'roles' in access:
-                    roles.extend(access['roles'])
-
-        # Визначаємо роль за пріоритетом
-        if 'ADMIN' in roles or 'admin' in roles:
-            return UserRole.ADMIN
-        elif 'DISPATCHER' in roles or 'dispatcher' in roles:
-            return UserRole.DISPATCHER
-        else:
-            # За замовчуванням диспетчер
-            return UserRole.DISPATCHER
+        return user
 
     def get_current_user(self, token: str) -> Optional[User]:
         """
@@ -355,27 +405,31 @@ class AuthService:
         Raises:
             AuthorizationError: Якщо немає прав доступу
         """
-        if not admin_user.is_admin():
+        # Роль перевіряється через закешований розбір, без побудови enum на кожен виклик
+        if _role_or_none(admin_user.role) is not UserRole.ADMIN:
             raise AuthorizationError("Тільки адміністратор може змінювати статус користувачів")
 
         try:
-            user = self.user_repository.find_by_id(user_id)
+            # Права адміністратора перевіряються в БД тим самим запитом, що й оновлення,
+            # тому закешований профіль адміністратора не дає застарілих прав
+            admin_ok, user = self.user_repository.set_user_active_as_admin(user_id, is_active, admin_user.id)
+            if not admin_ok:
+                raise AuthorizationError("Тільки адміністратор може змінювати статус користувачів")
             if not user:
                 log_error(f"Користувач з ID {user_id} не знайдений")
                 return False
 
-            if is_active:
-                user.activate()
-            else:
-                user.deactivate()
-
-            self.user_repository.update_user(user)
+            self.invalidate_user_cache(user_id)
 
             status_text = "активовано" if is_active else "деактивовано"
             log_auth_event(f"Користувача {user.username} {status_text} адміністратором {admin_user.username}")
 
             return True
 
+        except AuthorizationError:
+            log_auth_event(f"Відмовлено у зміні статусу користувача {user_id}: "
+                           f"{admin_user.username} більше не є активним адміністратором")
+            raise
         except Exception as e:
             log_error(f"Помилка при зміні статусу користувача: {str(e)}")
             return False
\ No newline at end of file
@@ -3,18 +3,23 @@
 Реалізує бізнес-логіку управління членами екіпажу та їх посадами
 """
 
+from collections import defaultdict
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
 from app.models import CrewMember
 from app.models.crew_position import CrewPosition
 from app.repositories import CrewRepository
-from app.utils.validators import CrewValidator, ValidationError
+from app.utils.validators import CrewValidator, ValidationError, CertificationLevel
 from app.utils.mappers import CrewMemberMapper, CrewPositionMapper
-from app.utils.decorators import LoggingDecorators, ErrorHandlingDecorators, ValidationDecorators
+from app.utils.decorators import LoggingDecorators, ErrorHandlingDecorators, ValidationDecorators, logged_call
 from app.config.logging_config import log_info, log_error, log_warning
 
 
+# Ранг рівнів сертифікації для сортування (вищий рівень - більше значення), будується один раз
+_CERTIFICATION_RANK = {level.value: rank for rank, level in enumerate(CertificationLevel)}
+
+
 class CrewService:
     """
     Сервіс для управління екіпажем авіакомпанії
@@ -22,14 +27,13 @@ class CrewService:
     log_execution = LoggingDecorators.log_execution
     handle_exceptions = ErrorHandlingDecorators.handle_exceptions
     validate_input = ValidationDecorators.validate_input
+    # Валідатор і мапери без стану - спільні для всіх екземплярів сервісу
+    crew_validator = CrewValidator()
+    crew_member_mapper = CrewMemberMapper()
+    crew_position_mapper = CrewPositionMapper()
+
     def __init__(self):
         self.crew_repository = CrewRepository()
-        self.crew_validator = CrewValidator()
-        self.crew_member_mapper = CrewMemberMapper()
-        self.crew_position_mapper = CrewPositionMapper()
-        self.log_execution = LoggingDecorators.log_execution
-        self.handle_exceptions = ErrorHandlingDecorators.handle_exceptions
-        self.validate_input = ValidationDecorators.validate_input
 
     @log_execution
     @handle_exceptions
@@ -70,8 +74,7 @@ class CrewService:
         log_info(f"Successfully created crew member with id {crew_member_id}")
         return self.crew_member_mapper.from_db_row(created_member)
 
-    @log_execution
-    @handle_exceptions
+    @logged_call
     def get_crew_member_by_id(self, crew_member_id: int) -> Optional[CrewMember]:
         """
         Отримання члена екіпажу за ID
@@ -88,8 +91,7 @@ class CrewService:
 
         return self.crew_member_mapper.from_db_row(crew_member_data)
 
-    @log_execution
-    @handle_exceptions
+    @logged_call
     def get_crew_member_by_employee_id(self, employee_id: str) -> Optional[CrewMember]:
         """
         Отримання члена екіпажу за службовим номером
@@ -157,12 +159,6 @@ class CrewService:
         """
         log_info(f"Updating crew member {crew_member_id} by user {updated_by_user_id}")
 
-        # Перевірка існування члена екіпажу
-        existing_member = self.crew_repository.find_by_id(crew_member_id)
-        if not existing_member:
-            log_warning(f"Crew member with id {crew_member_id} not found")
-            return None
-
         # Валідація даних для оновлення
         if update_data:
             # Часткова валідація тільки тих полів, які оновлюються
@@ -170,22 +166,23 @@ class CrewService:
             if filtered_data:
                 self.crew_validator.validate_crew_member_data(filtered_data, partial=True)
 
-        # Перевірка унікальності employee_id, якщо він оновлюється
-        if 'employee_id' in update_data and update_data['employee_id'] != existing_member.get('employee_id'):
+        # Перевірка унікальності employee_id, якщо він оновлюється. Окреме
+        # отримання члена екіпажу не потрібне: запис з цим номером, що не є
+        # самим членом екіпажу, означає конфлікт
+        if 'employee_id' in update_data:
             existing_with_employee_id = self.crew_repository.find_by_employee_id(update_data['employee_id'])
-            if existing_with_employee_id:
+            if existing_with_employee_id and existing_with_employee_id.id != crew_member_id:
                 raise ValidationError(f"Crew member with employee_id {update_data['employee_id']} already exists")
 
-        # Оновлення
-        success = self.crew_repository.update_crew_member(crew_member_id, update_data)
-        if not success:
-            log_error(f"Failed to update crew member {crew_member_id}")
+        # UPDATE ... RETURNING * повертає оновлений запис або None, якщо члена екіпажу
+        # не існує, тому попередня перевірка існування та повторне читання не потрібні
+        updated_member = self.crew_repository.update_crew_member(crew_member_id, update_data)
+        if not updated_member:
+            log_warning(f"Crew member with id {crew_member_id} not found")
             return None
 
-        # Отримання оновлених даних
-        updated_member_data = self.crew_repository.find_by_id(crew_member_id)
         log_info(f"Successfully updated crew member {crew_member_id}")
-        return self.crew_member_mapper.from_db_row(updated_member_data)
+        return updated_member
 
     @log_execution
     @handle_exceptions
@@ -203,22 +200,17 @@ class CrewService:
         """
         log_info(f"Setting crew member {crew_member_id} availability to {is_available} by user {updated_by_user_id}")
 
-        # Перевірка існування члена екіпажу
-        existing_member = self.crew_repository.find_by_id(crew_member_id)
-        if not existing_member:
-            log_warning(f"Crew member with id {crew_member_id} not found")
-            return False
-
+        # UPDATE не зачіпає жодного рядка, якщо члена екіпажу не існує,
+        # тому окрема перевірка існування не потрібна
         success = self.crew_repository.set_availability(crew_member_id, is_available)
         if success:
             log_info(f"Successfully updated availability for crew member {crew_member_id}")
         else:
-            log_error(f"Failed to update availability for crew member {crew_member_id}")
+            log_warning(f"Crew member with id {crew_member_id} not found")
 
         return success
 
-    @log_execution
-    @handle_exceptions
+    @logged_call
     def get_all_positions(self) -> List[CrewPosition]:
         """
         Отримання всіх позицій екіпажу
@@ -229,8 +221,7 @@ class CrewService:
         positions_data = self.crew_repository.get_all_positions()
         return [self.crew_position_mapper.from_db_row(data) for data in positions_data]
 
-    @log_execution
-    @handle_exceptions
+    @logged_call
     def get_position_by_id(self, position_id: int) -> Optional[CrewPosition]:
         """
         Отримання позиції за ID
@@ -262,15 +253,23 @@ class CrewService:
         """
         log_info(f"Getting crew workload statistics from {start_date} to {end_date}")
 
-
+        # Кількості по всіх посадах рахуються в БД одним запитом замість
+        # завантаження членів екіпажу для кожної посади окремо
+        position_stats = self.crew_repository.get_position_statistics()
 
         statistics = {
             'period': {
                 'start_date': start_date.isoformat(),
                 'end_date': end_date.isoformat()
             },
-            'total_crew_members': len(self.crew_repository.find_available_by_position(None)),  # Всі активні
-            'crew_by_position': {},
+            'total_crew_members': sum(row['total_members'] for row in position_stats),
+            'crew_by_position': {
+                row['position_name']: {
+                    'total_members': row['total_members'],
+                    'available_members': row['available_members']
+                }
+                for row in position_stats
+            },
             'workload_analysis': {
                 'overloaded_crew': [],
                 'underutilized_crew': [],
@@ -278,15 +277,6 @@ class CrewService:
             }
         }
 
-        # Збір статистики по позиціям
-        positions = self.get_all_positions()
-        for position in positions:
-            crew_in_position = self.get_available_crew_by_position(position.id)
-            statistics['crew_by_position'][position.position_name] = {
-                'total_members': len(crew_in_position),
-                'available_members': len([c for c in crew_in_position if c.is_available])
-            }
-
         return statistics
 
     @log_execution
@@ -303,14 +293,9 @@ class CrewService:
         Returns:
             bool: Чи доступний член екіпажу
         """
-        # Перевірка базової доступності
-        crew_member = self.get_crew_member_by_id(crew_member_id)
-        if not crew_member or not crew_member.is_available:
-            return False
-
-
-        available_crew = self.get_available_crew_for_flight(None, start_time, end_time)
-        return any(member.id == crew_member_id for member in available_crew)
+        # Базова доступність та конфлікти розкладу перевіряються одним запитом
+        # замість завантаження всього доступного на період екіпажу
+        return self.crew_repository.is_available_for_period(crew_member_id, start_time, end_time)
 
     @log_execution
     @handle_exceptions
@@ -333,23 +318,26 @@ class CrewService:
         recommendations = {}
         positions = self.get_all_positions()
 
+        # Доступний екіпаж не залежить від позиції, тому отримуємо його одним
+        # запитом і одразу групуємо за позицією замість запиту на кожну позицію
+        if departure_time and arrival_time:
+            available_members = self.get_available_crew_for_flight(flight_data.get('id'), departure_time, arrival_time)
+        else:
+            # Якщо часи не вказані, беремо всіх доступних
+            available_members = self.crew_repository.find_all_available()
+
+        crew_by_position = defaultdict(list)
+        for member in available_members:
+            crew_by_position[member.position_id].append(member)
+
         for position in positions:
-            available_crew = []
-            if departure_time and arrival_time:
-                # Отримуємо доступний екіпаж для цього часового періоду
-                available_for_flight = self.get_available_crew_for_flight(
-                    flight_data.get('id'), departure_time, arrival_time
-                )
-                available_crew = [
-                    member for member in available_for_flight
-                    if member.position_id == position.id
-                ]
-            else:
-                # Якщо часи не вказані, беремо всіх доступних за позицією
-                available_crew = self.get_available_crew_by_position(position.id)
+            available_crew = crew_by_position.get(position.id, [])
 
             # Сортуємо за досвідом (найбільш досвідчені спочатку)
-            available_crew.sort(key=lambda x: (x.experience_years, x.certification_level), reverse=True)
+            available_crew.sort(
+                key=lambda x: (x.experience_years, _CERTIFICATION_RANK.get(x.certification_level, -1)),
+                reverse=True
+            )
 
             recommendations[position.position_name] = available_crew[:5]  # Топ 5 кандидатів
 
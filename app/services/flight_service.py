@@ -1,31 +1,71 @@
 """
 Сервіс для управління рейсами авіакомпанії
 """
+from functools import cached_property
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 from app.repositories.flight_repository import FlightRepository
 from app.repositories.assignment_repository import AssignmentRepository
 from app.models import Flight
-from app.utils.validators import FlightValidator, ValidationError
-from app.utils.mappers import FlightMapper
-from app.utils.decorators import LoggingDecorators, ErrorHandlingDecorators, ValidationDecorators
+from app.utils.validators import FlightValidator, ValidationError, FlightStatus
+from app.utils.cache import TTLCache
+from app.utils.decorators import logged_call
 from app.config import log_info, log_error, log_warning
 
 
+# Допустимі статуси рейсу та переходи між ними, будуються один раз при імпорті
+VALID_FLIGHT_STATUSES = frozenset(flight_status.value for flight_status in FlightStatus)
+VALID_STATUS_TRANSITIONS = {
+    'SCHEDULED': frozenset({'DELAYED', 'CANCELLED', 'COMPLETED'}),
+    'DELAYED': frozenset({'SCHEDULED', 'CANCELLED', 'COMPLETED'}),
+    'CANCELLED': frozenset(),  # Скасований рейс не можна змінити
+    'COMPLETED': frozenset()   # Завершений рейс не можна змінити
+}
+
+# Зворотна таблиця переходів: з яких статусів можна перейти в заданий
+_ALLOWED_PREVIOUS_STATUSES = {
+    new_status: sorted(old for old, targets in VALID_STATUS_TRANSITIONS.items() if new_status in targets)
+    for new_status in VALID_FLIGHT_STATUSES
+}
+
+_FLIGHT_TIME_FIELDS = ('departure_time', 'arrival_time')
+
+
+def _coerce_flight_times(data: Dict[str, Any]) -> None:
+    """Перетворення часу рейсу з рядка в datetime на місці, один раз на запит.
+
+    Валідатор і репозиторій отримують вже datetime і не розбирають рядки повторно.
+    """
+    for field in _FLIGHT_TIME_FIELDS:
+        value = data.get(field)
+        if isinstance(value, str):
+            data[field] = datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
 class FlightService:
     """Сервіс для управління рейсами"""
-    log_execution = LoggingDecorators.log_execution
-    handle_exceptions = ErrorHandlingDecorators.handle_exceptions
-    validate_input = ValidationDecorators.validate_input
+    # Час життя закешованого рейсу (секунди): об'єднує повторні читання того
+    # самого рейсу в межах рендеру розкладу чи серії запитів
+    FLIGHT_CACHE_TTL = 5
+    # Валідатор не має стану, тому один екземпляр спільний для всіх сервісів
+    validator = FlightValidator()
+
     def __init__(self):
         self.flight_repository = FlightRepository()
-        self.assignment_repository = AssignmentRepository()
-        self.flight_mapper = FlightMapper()
-        self.validator = FlightValidator()
+        # Рейси за ID; оновлюються при кожній зміні рейсу через сервіс
+        self._flight_cache = TTLCache(ttl_seconds=self.FLIGHT_CACHE_TTL, max_size=1024)
+
+    def _cache_flight(self, flight: Flight) -> None:
+        """Збереження копії рейсу в кеші, щоб зміни повернутого об'єкта не потрапили в кеш"""
+        self._flight_cache.set(flight.id, flight.model_copy())
 
-    @log_execution
-    @handle_exceptions
-    @validate_input
+    @cached_property
+    def assignment_repository(self) -> AssignmentRepository:
+        """Репозиторій призначень створюється при першому використанні: він потрібен
+        лише операціям з екіпажем рейсу, а не читанню самих рейсів"""
+        return AssignmentRepository()
+
+    @logged_call
     def create_flight(self, flight_data: Dict[str, Any], created_by: int) -> Flight:
         """
         Створити новий рейс
@@ -42,64 +82,66 @@ class FlightService:
         """
         log_info(f"Creating new flight: {flight_data.get('flight_number')}")
 
-        # Валідація даних рейсу
-        self.validator.validate_flight_data(flight_data)
+        _coerce_flight_times(flight_data)
 
-        # Перевірка унікальності номера рейсу
-        existing_flight = self.flight_repository.find_by_flight_number(
-            flight_data['flight_number']
-        )
-        if existing_flight:
-            raise ValidationError(f"Рейс з номером {flight_data['flight_number']} вже існує")
+        # Поточний час береться один раз на запит для валідатора і сервісу
+        now = datetime.now()
+
+        # Валідація даних рейсу
+        self.validator.validate_flight_data(flight_data, now)
 
         # Валідація часу рейсу
         departure_time = flight_data['departure_time']
         arrival_time = flight_data['arrival_time']
 
-        if isinstance(departure_time, str):
-            departure_time = datetime.fromisoformat(departure_time)
-        if isinstance(arrival_time, str):
-            arrival_time = datetime.fromisoformat(arrival_time)
-
         if departure_time >= arrival_time:
             raise ValidationError("Час відправлення має бути раніше часу прибуття")
 
-        if departure_time <= datetime.now():
+        if departure_time <= now:
             raise ValidationError("Час відправлення має бути в майбутньому")
 
         # Додавання created_by до даних
         flight_data['created_by'] = created_by
 
-        # Створення рейсу в БД
-        flight_id = self.flight_repository.create_flight(flight_data)
+        # Створення рейсу в БД; INSERT ... RETURNING повертає повний рядок,
+        # тому повторне читання не потрібне. Унікальність номера рейсу
+        # перевіряється в тому ж запиті
+        created_flight = self.flight_repository.create_flight(flight_data)
+        if not created_flight:
+            raise ValidationError('flight_number', f"Рейс з номером {flight_data['flight_number']} вже існує")
 
-        # Отримання створеного рейсу
-        created_flight = self.flight_repository.find_by_id(flight_id)
+        self._cache_flight(created_flight)
+        log_info(f"Flight created successfully: {flight_data['flight_number']} (ID: {created_flight.id})")
 
-        log_info(f"Flight created successfully: {flight_data['flight_number']} (ID: {flight_id})")
+        return created_flight
 
-        return self.flight_mapper.from_db_row(created_flight)
-
-    @log_execution
-    @handle_exceptions
     def get_flight_by_id(self, flight_id: int) -> Optional[Flight]:
         """
         Отримати рейс за ID
 
+        Без декоратора логування: при влучанні в кеш обгортка коштувала б
+        більше за сам виклик. Помилки БД обробляють викликачі.
+
+        Кешований рейс може бути застарілим на FLIGHT_CACHE_TTL і не бачить змін
+        інших процесів, тому операції зміни читають рейс з БД, а не звідси.
+
         Args:
             flight_id: ID рейсу
 
         Returns:
             Optional[Flight]: Рейс або None
         """
-        flight_row = self.flight_repository.find_by_id(flight_id)
-        if not flight_row:
-            return None
+        flight = self._flight_cache.get(flight_id)
+        if flight is not None:
+            # Копія, щоб зміни викликача не потрапили в спільний кеш
+            return flight.model_copy()
 
-        return self.flight_mapper.from_db_row(flight_row)
+        flight = self.flight_repository.find_by_id(flight_id)
+        if flight:
+            self._cache_flight(flight)
+
+        return flight
 
-    @log_execution
-    @handle_exceptions
     def get_flight_by_number(self, flight_number: str) -> Optional[Flight]:
         """
         Отримати рейс за номером
@@ -110,14 +152,13 @@ class FlightService:
         Returns:
             Optional[Flight]: Рейс або None
         """
-        flight_row = self.flight_repository.find_by_flight_number(flight_number)
-        if not flight_row:
-            return None
+        flight = self.flight_repository.find_by_flight_number(flight_number)
+        if flight:
+            self._cache_flight(flight)
 
-        return self.flight_mapper.from_db_row(flight_row)
+        return flight
 
-    @log_execution
-    @handle_exceptions
+    @logged_call
     def get_flights_by_date_range(self, start_date: datetime, end_date: datetime) -> List[Flight]:
         """
         Отримати рейси за діапазоном дат
@@ -132,12 +173,10 @@ class FlightService:
         if start_date >= end_date:
             raise ValidationError("Початкова дата має бути раніше кінцевої")
 
-        flight_rows = self.flight_repository.find_all_by_date_range(start_date, end_date)
-
-        return [self.flight_mapper.from_db_row(row) for row in flight_rows]
+        # Репозиторій вже повертає список Flight, повторне перетворення не потрібне
+        return self.flight_repository.find_all_by_date_range(start_date, end_date)
 
-    @log_execution
-    @handle_exceptions
+    @logged_call
     def get_flights_by_status(self, status: str) -> List[Flight]:
         """
         Отримати рейси за статусом
@@ -148,16 +187,13 @@ class FlightService:
         Returns:
             List[Flight]: Список рейсів
         """
-        valid_statuses = ['SCHEDULED', 'DELAYED', 'CANCELLED', 'COMPLETED']
-        if status not in valid_statuses:
+        if status not in VALID_FLIGHT_STATUSES:
             raise ValidationError(f"Невалідний статус: {status}")
 
-        flight_rows = self.flight_repository.find_all_by_status(status)
-
-        return [self.flight_mapper.from_db_row(row) for row in flight_rows]
+        # Репозиторій вже повертає список Flight, повторне перетворення не потрібне
+        return self.flight_repository.find_all_by_status(status)
 
-    @log_execution
-    @handle_exceptions
+    @logged_call
     def get_flights_needing_crew(self) -> List[Flight]:
         """
         Отримати рейси які потребують призначення екіпажу
@@ -165,13 +201,10 @@ class FlightService:
         Returns:
             List[Flight]: Список рейсів
         """
-        flight_rows = self.flight_repository.find_flights_needing_crew()
+        # Репозиторій вже повертає список Flight, повторне перетворення не потрібне
+        return self.flight_repository.find_flights_needing_crew()
 
-        return [self.flight_mapper.from_db_row(row) for row in flight_rows]
-
-    @log_execution
-    @handle_exceptions
-    @validate_input
+    @logged_call
     def update_flight(self, flight_id: int, update_data: Dict[str, Any]) -> Flight:
         """
         Оновити дані рейсу
@@ -188,46 +221,40 @@ class FlightService:
         """
         log_info(f"Updating flight ID: {flight_id}")
 
-        # Перевірка існування рейсу
-        existing_flight = self.flight_repository.find_by_id(flight_id)
-        if not existing_flight:
-            raise ValidationError(f"Рейс з ID {flight_id} не знайдено")
-
-        # Валідація даних оновлення
-        if 'flight_number' in update_data:
-            other_flight = self.flight_repository.find_by_flight_number(
-                update_data['flight_number']
-            )
-            if other_flight and other_flight[0] != flight_id:
-                raise ValidationError(f"Рейс з номером {update_data['flight_number']} вже існує")
-
-        # Валідація часу рейсу якщо оновлюється
+        # Валідація часу рейсу якщо оновлюється. Поточний рейс читається лише
+        # коли оновлюється один з двох часів і потрібне значення другого
         if 'departure_time' in update_data or 'arrival_time' in update_data:
-            departure_time = update_data.get('departure_time', existing_flight[4])
-            arrival_time = update_data.get('arrival_time', existing_flight[5])
+            _coerce_flight_times(update_data)
+            departure_time = update_data.get('departure_time')
+            arrival_time = update_data.get('arrival_time')
 
-            if isinstance(departure_time, str):
-                departure_time = datetime.fromisoformat(departure_time)
-            if isinstance(arrival_time, str):
-                arrival_time = datetime.fromisoformat(arrival_time)
+            if departure_time is None or arrival_time is None:
+                existing_flight = self.flight_repository.find_by_id(flight_id)
+                if not existing_flight:
+                    raise ValidationError('flight_id', f"Рейс з ID {flight_id} не знайдено")
+                departure_time = departure_time or existing_flight.departure_time
+                arrival_time = arrival_time or existing_flight.arrival_time
 
             if departure_time >= arrival_time:
                 raise ValidationError("Час відправлення має бути раніше часу прибуття")
 
-        # Оновлення в БД
-        success = self.flight_repository.update_flight(flight_id, update_data)
-        if not success:
-            raise ValueError("Помилка при оновленні рейсу")
-
-        # Отримання оновленого рейсу
-        updated_flight = self.flight_repository.find_by_id(flight_id)
-
+        # Оновлення в БД; існування рейсу та унікальність номера перевіряються
+        # в самому UPDATE, а RETURNING повертає оновлений рядок
+        updated_flight = self.flight_repository.update_flight(flight_id, update_data)
+        if not updated_flight:
+            # Додатковий запит лише на шляху помилки, щоб назвати її причину
+            if 'flight_number' in update_data:
+                other_flight = self.flight_repository.find_by_flight_number(update_data['flight_number'])
+                if other_flight and other_flight.id != flight_id:
+                    raise ValidationError('flight_number', f"Рейс з номером {update_data['flight_number']} вже існує")
+            raise ValidationError('flight_id', f"Рейс з ID {flight_id} не знайдено")
+
+        self._cache_flight(updated_flight)
         log_info(f"Flight updated successfully: ID {flight_id}")
 
-        return self.flight_mapper.from_db_row(updated_flight)
+        return updated_flight
 
-    @log_execution
-    @handle_exceptions
+    @logged_call
     def update_flight_status(self, flight_id: int, new_status: str, reason: str = None) -> Flight:
         """
         Оновити статус рейсу
@@ -242,53 +269,40 @@ class FlightService:
         """
         log_info(f"Updating flight status: ID {flight_id}, new status: {new_status}")
 
-        valid_statuses = ['SCHEDULED', 'DELAYED', 'CANCELLED', 'COMPLETED']
-        if new_status not in valid_statuses:
+        if new_status not in VALID_FLIGHT_STATUSES:
             raise ValidationError(f"Невалідний статус: {new_status}")
 
-        # Перевірка існування рейсу
-        existing_flight = self.flight_repository.find_by_id(flight_id)
-        if not existing_flight:
-            raise ValidationError(f"Рейс з ID {flight_id} не знайдено")
-
-        current_status = existing_flight[7]  # status field
-
-        # Логіка переходів статусів
-        valid_transitions = {
-            'SCHEDULED': ['DELAYED', 'CANCELLED', 'COMPLETED'],
-            'DELAYED': ['SCHEDULED', 'CANCELLED', 'COMPLETED'],
-            'CANCELLED': [],  # Скасований рейс не можна змінити
-            'COMPLETED': []   # Завершений рейс не можна змінити
-        }
+        # Оновлення статусу; правило переходу перевіряється в самому UPDATE
+        # (поточний статус має бути серед допустимих попередніх), тож на
+        # успішному шляху потрібен лише один запит
+        from_statuses = _ALLOWED_PREVIOUS_STATUSES[new_status]
+        cancelled_count = 0
+        if new_status == 'CANCELLED':
+            # Скасування рейсу та всіх призначень екіпажу атомарно, одним запитом
+            updated_flight, cancelled_count = self.flight_repository.cancel_flight(
+                flight_id, from_statuses, reason
+            )
+        else:
+            updated_flight = self.flight_repository.update_flight_status(flight_id, new_status, from_statuses)
 
-        if new_status not in valid_transitions.get(current_status, []):
+        if not updated_flight:
+            # Статус читається лише щоб пояснити причину відмови
+            current_status = self.flight_repository.find_status_by_id(flight_id)
+            if current_status is None:
+                raise ValidationError('flight_id', f"Рейс з ID {flight_id} не знайдено")
             raise ValidationError(
-                f"Неможливо змінити статус з {current_status} на {new_status}"
+                'status', f"Неможливо змінити статус з {current_status} на {new_status}"
             )
 
-        # Оновлення статусу
-        success = self.flight_repository.update_flight_status(flight_id, new_status)
-        if not success:
-            raise ValueError("Помилка при оновленні статусу рейсу")
-
-        # Якщо рейс скасовано, скасувати всі призначення екіпажу
         if new_status == 'CANCELLED':
-            assignments = self.assignment_repository.find_by_flight_id(flight_id)
-            for assignment in assignments:
-                self.assignment_repository.update_assignment_status(
-                    assignment[0], 'CANCELLED'
-                )
-            log_warning(f"Cancelled all crew assignments for flight {flight_id}")
-
-        # Отримання оновленого рейсу
-        updated_flight = self.flight_repository.find_by_id(flight_id)
+            log_warning(f"Cancelled {cancelled_count} crew assignments for flight {flight_id}")
 
+        self._cache_flight(updated_flight)
         log_info(f"Flight status updated: ID {flight_id}, status: {new_status}")
 
-        return self.flight_mapper.from_db_row(updated_flight)
+        return updated_flight
 
-    @log_execution
-    @handle_exceptions
+    @logged_call
     def delete_flight(self, flight_id: int) -> bool:
         """
         Видалити рейс
@@ -301,14 +315,13 @@ class FlightService:
         """
         log_info(f"Deleting flight: ID {flight_id}")
 
-        # Перевірка існування рейсу
+        # Перевірка існування рейсу безпосередньо в БД, а не в кеші
         existing_flight = self.flight_repository.find_by_id(flight_id)
         if not existing_flight:
-            raise ValidationError(f"Рейс з ID {flight_id} не знайдено")
+            raise ValidationError('flight_id', f"Рейс з ID {flight_id} не знайдено")
 
-        # Перевірка чи є призначення екіпажу
-        assignments = self.assignment_repository.find_by_flight_id(flight_id)
-        if assignments:
+        # Перевірка чи є призначення екіпажу (EXISTS зупиняється на першому збігу)
+        if self.assignment_repository.has_active_assignments_for_flight(flight_id):
             raise ValidationError(
                 "Не можна видалити рейс з призначеним екіпажем. "
                 "Спочатку скасуйте всі призначення."
@@ -316,6 +329,7 @@ class FlightService:
 
         # Видалення рейсу
         success = self.flight_repository.delete_flight(flight_id)
+        self._flight_cache.invalidate(flight_id)
 
         if success:
             log_info(f"Flight deleted successfully: ID {flight_id}")
@@ -324,24 +338,29 @@ class FlightService:
 
         return success
 
-    @log_execution
-    @handle_exceptions
-    def get_flight_crew_summary(self, flight_id: int) -> Dict[str, Any]:
+    @logged_call
+    def get_flight_crew_summary(self, flight_id: int, flight: Optional[Flight] = None) -> Optional[Dict[str, Any]]:
         """
         Отримати зведення по екіпажу рейсу
 
         Args:
             flight_id: ID рейсу
+            flight: Вже завантажений рейс, щоб не читати його повторно
 
         Returns:
-            Dict: Зведення по екіпажу
+            Optional[Dict]: Зведення по екіпажу або None якщо рейс не знайдено
         """
-        flight = self.get_flight_by_id(flight_id)
-        if not flight:
-            raise ValidationError(f"Рейс з ID {flight_id} не знайдено")
+        if flight is None:
+            # Рейс і його призначення читаються одним запитом
+            found = self.flight_repository.find_with_assignments(flight_id)
+            if not found:
+                return None
+            flight, assignments = found
+            self._cache_flight(flight)
+        else:
+            assignments = self.assignment_repository.find_by_flight_id(flight_id)
 
-        assignments = self.assignment_repository.find_by_flight_id(flight_id)
-        assigned_count = len([a for a in assignments if a[4] == 'ASSIGNED'])  # status field
+        assigned_count = sum(1 for a in assignments if a.status == 'ASSIGNED')
 
         return {
             'flight_id': flight_id,
@@ -352,8 +371,7 @@ class FlightService:
             'assignments': assignments
         }
 
-    @log_execution
-    @handle_exceptions
+    @logged_call
     def get_daily_flight_schedule(self, date: datetime) -> List[Dict[str, Any]]:
         """
         Отримати розклад рейсів на день
@@ -367,22 +385,28 @@ class FlightService:
         start_date = date.replace(hour=0, minute=0, second=0, microsecond=0)
         end_date = start_date + timedelta(days=1)
 
-        flights = self.get_flights_by_date_range(start_date, end_date)
+        # Межі дня побудовані тут і завжди впорядковані, тому перевірка
+        # діапазону з get_flights_by_date_range не потрібна
+        flights = self.flight_repository.find_all_by_date_range(start_date, end_date)
+
+        # Для розкладу потрібні лише кількості призначень, тому вони рахуються
+        # в БД одним запитом для всіх рейсів дня без передачі самих рядків
+        assigned_by_flight = self.assignment_repository.count_assigned_by_flight_ids(
+            [flight.id for flight in flights]
+        )
 
         schedule = []
         for flight in flights:
-            crew_summary = self.get_flight_crew_summary(flight.id)
+            assigned_count = assigned_by_flight.get(flight.id, 0)
 
             schedule.append({
                 'flight': flight,
                 'crew_status': {
-                    'required': crew_summary['crew_required'],
-                    'assigned': crew_summary['crew_assigned'],
-                    'is_ready': crew_summary['is_fully_staffed']
+                    'required': flight.crew_required,
+                    'assigned': assigned_count,
+                    'is_ready': assigned_count >= flight.crew_required
                 }
             })
 
-        # Сортування за часом відправлення
-        schedule.sort(key=lambda x: x['flight'].departure_time)
-
+        # Рейси вже відсортовані за часом відправлення в запиті (ORDER BY departure_time)
         return schedule
\ No newline at end of file
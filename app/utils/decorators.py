@@ -1,14 +1,22 @@
 import functools
+import inspect
+import logging
 import time
-from typing import Callable, List, Union
+from typing import Callable, Collection, Union
 import jwt
 from fastapi import HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.config import log_info, log_error, log_warning, log_auth_event
+from app.config.logging_config import log_debug, is_debug_enabled, is_enabled_for
 from app.models.user import User
 from app.utils.jwt_utils import JWTManager
 
 
+# Набори ролей для перевірки доступу, будуються один раз при імпорті
+ADMIN_ONLY = frozenset({"ADMIN"})
+ADMIN_OR_DISPATCHER = frozenset({"ADMIN", "DISPATCHER"})
+
+
 class AuthDecorators:
     """Декоратори для авторизації та перевірки ролей"""
     def __init__(self):
@@ -53,10 +61,12 @@ class AuthDecorators:
         return wrapper
 
     @staticmethod
-    def role_required(allowed_roles: Union[str, List[str]]) -> Callable:
+    def role_required(allowed_roles: Union[str, Collection[str]]) -> Callable:
         """Декоратор для перевірки ролі користувача"""
         if isinstance(allowed_roles, str):
-            allowed_roles = [allowed_roles]
+            allowed_roles = frozenset((allowed_roles,))
+        elif not isinstance(allowed_roles, frozenset):
+            allowed_roles = frozenset(allowed_roles)
 
         def decorator(f: Callable) -> Callable:
             @functools.wraps(f)
@@ -69,7 +79,7 @@ class AuthDecorators:
 
                 if current_user.role not in allowed_roles:
                     log_auth_event("ROLE_CHECK_FAILED",
-                                   f"User {current_user.username} with role {current_user.role} tried to access resource requiring {allowed_roles}",
+                                   f"User {current_user.username} with role {current_user.role} tried to access resource requiring {sorted(allowed_roles)}",
                                    current_user.id)
                     raise HTTPException(status_code=403, detail="Insufficient permissions")
 
@@ -85,12 +95,12 @@ class AuthDecorators:
     @staticmethod
     def admin_required(f: Callable) -> Callable:
         """Декоратор для перевірки адміністраторських прав"""
-        return AuthDecorators.role_required("ADMIN")(f)
+        return AuthDecorators.role_required(ADMIN_ONLY)(f)
 
     @staticmethod
     def dispatcher_required(f: Callable) -> Callable:
         """Декоратор для перевірки прав диспетчера"""
-        return AuthDecorators.role_required(["ADMIN", "DISPATCHER"])(f)
+        return AuthDecorators.role_required(ADMIN_OR_DISPATCHER)(f)
 
 
 class LoggingDecorators:
@@ -98,29 +108,77 @@ class LoggingDecorators:
 
     @staticmethod
     def log_execution(operation_name: str = None) -> Callable:
-        """Декоратор для логування виконання функцій"""
+        """Декоратор для логування виконання функцій.
+
+        Час виконання вимірюється та логується лише коли увімкнено рівень DEBUG,
+        інакше логуються тільки помилки. Якщо на момент декорування логування
+        вимкнене навіть для помилок, функція повертається без обгортки.
+        Можна застосовувати без дужок.
+        """
+        if callable(operation_name):
+            return LoggingDecorators.log_execution()(operation_name)
 
         def decorator(f: Callable) -> Callable:
+            # Обгортка нічого не запише, тому не додаємо зайвий рівень виклику
+            if not is_enabled_for(logging.ERROR):
+                return f
+
+            func_name = operation_name or f.__name__
+
+            # Тип обгортки визначається один раз при декоруванні: синхронні функції
+            # не загортаються в корутину на кожен виклик
+            if inspect.iscoroutinefunction(f):
+                @functools.wraps(f)
+                async def wrapper(*args, **kwargs):
+                    if not is_debug_enabled():
+                        try:
+                            return await f(*args, **kwargs)
+                        except Exception as e:
+                            log_error(f"Error in {func_name}: {str(e)}")
+                            raise
+
+                    start_time = time.perf_counter()
+
+                    # Логуємо початок виконання
+                    log_debug(f"Starting {func_name}")
+
+                    try:
+                        result = await f(*args, **kwargs)
+                        execution_time = time.perf_counter() - start_time
+                        log_debug(f"Completed {func_name} in {execution_time:.3f}s")
+                        return result
+
+                    except Exception as e:
+                        execution_time = time.perf_counter() - start_time
+                        log_error(f"Error in {func_name} after {execution_time:.3f}s: {str(e)}")
+                        raise
+
+                return wrapper
+
             @functools.wraps(f)
-            async def wrapper(*args, **kwargs):
-                func_name = operation_name or f.__name__
-                start_time = time.time()
+            def sync_wrapper(*args, **kwargs):
+                if not is_debug_enabled():
+                    try:
+                        return f(*args, **kwargs)
+                    except Exception as e:
+                        log_error(f"Error in {func_name}: {str(e)}")
+                        raise
 
-                # Логуємо початок виконання
-                log_info(f"Starting {func_name}")
+                start_time = time.perf_counter()
+                log_debug(f"Starting {func_name}")
 
                 try:
-                    result = await f(*args, **kwargs)
-                    execution_time = time.time() - start_time
-                    log_info(f"Completed {func_name} in {execution_time:.2f}s")
+                    result = f(*args, **kwargs)
+                    execution_time = time.perf_counter() - start_time
+                    log_debug(f"Completed {func_name} in {execution_time:.3f}s")
                     return result
 
                 except Exception as e:
-                    execution_time = time.time() - start_time
-                    log_error(f"Error in {func_name} after {execution_time:.2f}s: {str(e)}")
+                    execution_time = time.perf_counter() - start_time
+                    log_error(f"Error in {func_name} after {execution_time:.3f}s: {str(e)}")
                     raise
 
-            return wrapper
+            return sync_wrapper
 
         return decorator
 
@@ -129,11 +187,15 @@ class LoggingDecorators:
         """Декоратор для логування операцій з базою даних"""
 
         def decorator(f: Callable) -> Callable:
+            if not is_enabled_for(logging.ERROR):
+                return f
+
             @functools.wraps(f)
             def wrapper(*args, **kwargs):
                 try:
                     result = f(*args, **kwargs)
-                    log_info(f"Database {operation_type} on {table_name} completed successfully")
+                    if is_enabled_for(logging.INFO):
+                        log_info(f"Database {operation_type} on {table_name} completed successfully")
                     return result
                 except Exception as e:
                     log_error(f"Database {operation_type} on {table_name} failed: {str(e)}")
@@ -170,32 +232,54 @@ class ValidationDecorators:
         return decorator
 
 
+def _to_http_exception(f: Callable, e: Exception, status_code: int = 500) -> HTTPException:
+    """Перетворення винятку у HTTPException з логуванням"""
+    if isinstance(e, ValueError):
+        log_warning(f"Value error in {f.__name__}: {str(e)}")
+        return HTTPException(status_code=400, detail=str(e))
+    log_error(f"Unexpected error in {f.__name__}: {str(e)}")
+    return HTTPException(
+        status_code=status_code,
+        detail="Internal server error"
+    )
+
+
 class ErrorHandlingDecorators:
     """Декоратори для обробки помилок"""
 
     @staticmethod
     def handle_exceptions(default_status_code: int = 500) -> Callable:
-        """Декоратор для обробки винятків"""
+        """Декоратор для обробки винятків. Можна застосовувати без дужок."""
+        if callable(default_status_code):
+            return ErrorHandlingDecorators.handle_exceptions()(default_status_code)
+
+        def convert(f: Callable, e: Exception) -> HTTPException:
+            return _to_http_exception(f, e, default_status_code)
 
         def decorator(f: Callable) -> Callable:
+            if inspect.iscoroutinefunction(f):
+                @functools.wraps(f)
+                async def wrapper(*args, **kwargs):
+                    try:
+                        return await f(*args, **kwargs)
+                    except HTTPException:
+                        # Пропускаємо HTTP винятки без змін
+                        raise
+                    except Exception as e:
+                        raise convert(f, e)
+
+                return wrapper
+
             @functools.wraps(f)
-            async def wrapper(*args, **kwargs):
+            def sync_wrapper(*args, **kwargs):
                 try:
-                    return await f(*args, **kwargs)
+                    return f(*args, **kwargs)
                 except HTTPException:
-                    # Пропускаємо HTTP винятки без змін
                     raise
-                except ValueError as e:
-                    log_warning(f"Value error in {f.__name__}: {str(e)}")
-                    raise HTTPException(status_code=400, detail=str(e))
                 except Exception as e:
-                    log_error(f"Unexpected error in {f.__name__}: {str(e)}")
-                    raise HTTPException(
-                        status_code=default_status_code,
-                        detail="Internal server error"
-                    )
+                    raise convert(f, e)
 
-            return wrapper
+            return sync_wrapper
 
         return decorator
 
@@ -306,3 +390,36 @@ def authenticated_dispatcher(f: Callable) -> Callable:
         )
     )
 
+
+def logged_call(f: Callable) -> Callable:
+    """Комбінований декоратор: логування виконання + обробка винятків.
+
+    Поводиться як log_execution поверх handle_exceptions, але додає лише один
+    рівень обгортки. Призначений для синхронних методів сервісів.
+    """
+    if inspect.iscoroutinefunction(f):
+        return LoggingDecorators.log_execution()(ErrorHandlingDecorators.handle_exceptions()(f))
+
+    func_name = f.__name__
+
+    @functools.wraps(f)
+    def wrapper(*args, **kwargs):
+        start_time = time.perf_counter() if is_debug_enabled() else None
+        if start_time is not None:
+            log_debug(f"Starting {func_name}")
+
+        try:
+            result = f(*args, **kwargs)
+        except HTTPException as e:
+            log_error(f"Error in {func_name}: {str(e)}")
+            raise
+        except Exception as e:
+            http_error = _to_http_exception(f, e)
+            log_error(f"Error in {func_name}: {str(http_error)}")
+            raise http_error
+
+        if start_time is not None:
+            log_debug(f"Completed {func_name} in {time.perf_counter() - start_time:.3f}s")
+        return result
+
+    return wrapper
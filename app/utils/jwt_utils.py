@@ -1,14 +1,18 @@
 import jwt
-import json
+import orjson
 import requests
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional, List, Union
+from typing import Dict, Any, Optional, List, Tuple, Union
 from functools import wraps
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.asymmetric import rsa
 import base64
 import hashlib
 import secrets
+import threading
+import time
+
+from app.utils.cache import TTLCache
 
 
 class JWTError(Exception):
@@ -46,13 +50,27 @@ class JWTManager:
         self.config = config or JWTConfig()
         self._public_keys_cache = {}
         self._cache_expiry = None
+        # Час життя токенів у секундах обчислюємо один раз
+        self._access_token_ttl = self.config.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        self._refresh_token_ttl = self.config.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60
 
     def create_access_token(self, user_data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
         """Створення access токена"""
+        return self.create_access_token_with_expiry(user_data, expires_delta)[0]
+
+    def create_access_token_with_expiry(self, user_data: Dict[str, Any],
+                                        expires_delta: Optional[timedelta] = None) -> Tuple[str, int]:
+        """Створення access токена разом з часом його дії в секундах.
+
+        Час дії береться з того ж значення, що записується в exp, тому його не
+        потрібно обчислювати окремо чи декодувати з готового токена.
+        """
         if expires_delta:
-            expire = datetime.utcnow() + expires_delta
+            expires_in = int(expires_delta.total_seconds())
         else:
-            expire = datetime.utcnow() + timedelta(minutes=self.config.ACCESS_TOKEN_EXPIRE_MINUTES)
+            expires_in = self._access_token_ttl
+
+        issued_at = int(time.time())
 
         payload = {
             "sub": str(user_data.get("id")),  # Subject (user ID)
@@ -60,26 +78,26 @@ class JWTManager:
             "email": user_data.get("email"),
             "role": user_data.get("role"),
             "keycloak_id": user_data.get("keycloak_id"),
-            "exp": expire,  # Expiration time
-            "iat": datetime.utcnow(),  # Issued at
+            "exp": issued_at + expires_in,  # Expiration time
+            "iat": issued_at,  # Issued at
             "iss": self.config.ISSUER,  # Issuer
             "aud": self.config.AUDIENCE,  # Audience
             "type": "access"
         }
 
         try:
-            return jwt.encode(payload, self.config.SECRET_KEY, algorithm=self.config.ALGORITHM)
+            return jwt.encode(payload, self.config.SECRET_KEY, algorithm=self.config.ALGORITHM), expires_in
         except Exception as e:
             raise JWTError(f"Помилка створення токена: {str(e)}")
 
     def create_refresh_token(self, user_id: Union[str, int]) -> str:
         """Створення refresh токена"""
-        expire = datetime.utcnow() + timedelta(days=self.config.REFRESH_TOKEN_EXPIRE_DAYS)
+        issued_at = int(time.time())
 
         payload = {
             "sub": str(user_id),
-            "exp": expire,
-            "iat": datetime.utcnow(),
+            "exp": issued_at + self._refresh_token_ttl,
+            "iat": issued_at,
             "iss": self.config.ISSUER,
             "type": "refresh",
             "jti": secrets.token_urlsafe(32)  # JWT ID для унікальності
@@ -174,39 +192,128 @@ class JWTManager:
 class KeycloakJWTManager:
     """Менеджер для роботи з JWT токенами від Keycloak"""
 
-    def __init__(self, keycloak_config: Dict[str, Any]):
+    # Ключі Keycloak ротуються рідко, тому тримаємо їх довго (секунди)
+    KEYS_TTL = 3600
+    # Мінімальний інтервал між примусовими оновленнями при невідомому kid
+    # та між повторними спробами після невдалого оновлення (секунди)
+    KEYS_MIN_REFRESH_INTERVAL = 30
+    # Максимальний час кешування вже перевіреного токена (секунди)
+    VERIFIED_TOKEN_TTL = 300
+    # Запас до exp, щоб не віддавати з кешу токен, який от-от стане недійсним
+    VERIFIED_TOKEN_EXP_LEEWAY = 30
+
+    def __init__(self, keycloak_config: Union[Dict[str, Any], Any], session: Optional[requests.Session] = None):
         self.keycloak_config = keycloak_config
-        self.server_url = keycloak_config.get("server_url")
-        self.realm = keycloak_config.get("realm")
-        self.client_id = keycloak_config.get("client_id")
+        if isinstance(keycloak_config, dict):
+            self.server_url = keycloak_config.get("server_url")
+            self.realm = keycloak_config.get("realm")
+            self.client_id = keycloak_config.get("client_id")
+        else:
+            self.server_url = keycloak_config.server_url
+            self.realm = keycloak_config.realm
+            self.client_id = keycloak_config.client_id
+            session = session or getattr(keycloak_config, "session", None)
+        self.certs_url = f"{self.server_url}/realms/{self.realm}/protocol/openid-connect/certs"
+        # Спільна HTTP сесія з пулом з'єднань замість нового з'єднання на кожен запит
+        self.session = session or requests.Session()
         self._public_keys = {}
+        # Вже розібрані RSA ключі за kid, щоб не конвертувати JWK на кожен токен
+        self._public_key_objects = {}
         self._keys_last_updated = None
-
-    def get_public_keys(self) -> Dict[str, Any]:
+        # Час останньої невдалої спроби оновлення, щоб під час недоступності
+        # Keycloak не запитувати ключі на кожен запит
+        self._keys_last_failed = None
+        self._keys_lock = threading.Lock()
+        # Чи вже виконується фонове оновлення; змінюється лише під _refresh_state_lock
+        self._refresh_in_flight = False
+        self._refresh_state_lock = threading.Lock()
+        # Вже перевірені токени за їх хешем, щоб не перевіряти RSA підпис на кожен запит
+        self._verified_tokens = TTLCache(ttl_seconds=self.VERIFIED_TOKEN_TTL, max_size=10000)
+
+    def _keys_fresh(self) -> bool:
+        """Перевірка чи кеш ключів ще актуальний"""
+        # Монотонний час замість datetime.now(): без створення datetime на кожну перевірку токена
+        return (self._keys_last_updated is not None and
+                time.monotonic() - self._keys_last_updated < self.KEYS_TTL)
+
+    def get_public_keys(self, force_refresh: bool = False) -> Dict[str, Any]:
         """Отримання публічних ключів від Keycloak"""
-        # Кешуємо ключі на 1 годину
-        if (self._keys_last_updated and
-                datetime.now() - self._keys_last_updated < timedelta(hours=1)):
+        if not force_refresh and self._keys_fresh():
             return self._public_keys
 
+        # Оновлює лише один потік, решта чекає і бере вже оновлений кеш
+        with self._keys_lock:
+            if not force_refresh and self._keys_fresh():
+                return self._public_keys
+
+            try:
+                response = self.session.get(self.certs_url, timeout=10)
+                response.raise_for_status()
+
+                keys_data = orjson.loads(response.content)
+                public_keys = {}
+                key_objects = {}
+
+                for key in keys_data.get("keys", []):
+                    kid = key.get("kid")
+                    if kid:
+                        public_keys[kid] = key
+                        if key.get("kty") == "RSA":
+                            key_objects[kid] = self._jwk_to_public_key(key)
+
+                self._public_keys = public_keys
+                self._public_key_objects = key_objects
+                self._keys_last_updated = time.monotonic()
+                return self._public_keys
+
+            except Exception as e:
+                self._keys_last_failed = time.monotonic()
+                raise JWTError(f"Помилка отримання публічних ключів Keycloak: {str(e)}")
+
+    def _refresh_allowed(self, last_attempt: Optional[float]) -> bool:
+        """Чи минув мінімальний інтервал після останнього оновлення або невдалої спроби"""
+        last_failed = self._keys_last_failed
+        if last_failed is not None and (last_attempt is None or last_failed > last_attempt):
+            last_attempt = last_failed
+        return last_attempt is None or time.monotonic() - last_attempt >= self.KEYS_MIN_REFRESH_INTERVAL
+
+    def _refresh_keys_in_background(self) -> None:
+        """Запуск оновлення ключів в окремому потоці, не більше одного одночасно"""
+        with self._refresh_state_lock:
+            if self._refresh_in_flight or not self._refresh_allowed(None):
+                return
+            self._refresh_in_flight = True
+        threading.Thread(target=self._background_refresh, daemon=True).start()
+
+    def _background_refresh(self) -> None:
+        """Оновлення ключів у фоні; при помилці залишаються попередні ключі"""
         try:
-            certs_url = f"{self.server_url}/realms/{self.realm}/protocol/openid_connect/certs"
-            response = requests.get(certs_url, timeout=10)
-            response.raise_for_status()
-
-            keys_data = response.json()
-            self._public_keys = {}
-
-            for key in keys_data.get("keys", []):
-                kid = key.get("kid")
-                if kid:
-                    self._public_keys[kid] = key
-
-            self._keys_last_updated = datetime.now()
-            return self._public_keys
-
-        except Exception as e:
-            raise JWTError(f"Помилка отримання публічних ключів Keycloak: {str(e)}")
+            self.get_public_keys()
+        except JWTError:
+            pass
+        finally:
+            with self._refresh_state_lock:
+                self._refresh_in_flight = False
+
+    def get_public_key(self, kid: str):
+        """Отримання розібраного публічного ключа за kid з лінивим оновленням"""
+        if not self._public_key_objects:
+            self.get_public_keys()
+        elif not self._keys_fresh():
+            # Застарілі ключі ще придатні - оновлюємо їх у фоні, не затримуючи запит
+            self._refresh_keys_in_background()
+        public_key = self._public_key_objects.get(kid)
+        if public_key is not None:
+            return public_key
+
+        # Невідомий kid - можлива ротація ключів, оновлюємо кеш не частіше за інтервал
+        if self._refresh_allowed(self._keys_last_updated):
+            self.get_public_keys(force_refresh=True)
+            public_key = self._public_key_objects.get(kid)
+
+        if public_key is None:
+            raise InvalidTokenError(f"Невідомий kid: {kid}")
+        return public_key
 
     def _jwk_to_public_key(self, jwk_data: Dict[str, Any]):
         """Конвертація JWK в публічний ключ"""
@@ -229,6 +336,11 @@ class KeycloakJWTManager:
 
     def decode_keycloak_token(self, token: str) -> Dict[str, Any]:
         """Декодування токена від Keycloak"""
+        token_digest = hashlib.blake2b(token.encode(), digest_size=16).digest()
+        cached_payload = self._verified_tokens.get(token_digest)
+        if cached_payload is not None:
+            return dict(cached_payload)
+
         try:
             # Отримуємо header токена
             unverified_header = jwt.get_unverified_header(token)
@@ -237,15 +349,8 @@ class KeycloakJWTManager:
             if not kid:
                 raise InvalidTokenError("Відсутній kid в header токена")
 
-            # Отримуємо публічні ключі
-            public_keys = self.get_public_keys()
-
-            if kid not in public_keys:
-                raise InvalidTokenError(f"Невідомий kid: {kid}")
-
-            # Конвертуємо JWK в публічний ключ
-            key_data = public_keys[kid]
-            public_key = self._jwk_to_public_key(key_data)
+            # Отримуємо вже розібраний публічний ключ з кешу
+            public_key = self.get_public_key(kid)
 
             # Декодуємо токен
             payload = jwt.decode(
@@ -256,6 +361,11 @@ class KeycloakJWTManager:
                 options={"verify_exp": True}
             )
 
+            # Час життя запису обмежений exp самого токена
+            ttl = min(self.VERIFIED_TOKEN_TTL, payload.get("exp", 0) - time.time() - self.VERIFIED_TOKEN_EXP_LEEWAY)
+            if ttl > 0:
+                self._verified_tokens.set(token_digest, dict(payload), ttl_seconds=ttl)
+
             return payload
 
         except jwt.ExpiredSignatureError:
@@ -0,0 +1,37 @@
+from typing import Any, Dict, Iterator
+
+from app.models.user import UserRole
+
+
+# Назви ролей Keycloak, що дають роль адміністратора
+ADMIN_ROLES = frozenset({'ADMIN', 'admin'})
+
+
+def iter_keycloak_roles(keycloak_data: Dict[str, Any]) -> Iterator[str]:
+    """Повертає ролі з realm_access та resource_access без побудови проміжного списку"""
+    realm_access = keycloak_data.get('realm_access')
+    if realm_access:
+        yield from realm_access.get('roles', ())
+
+    resource_access = keycloak_data.get('resource_access')
+    if resource_access:
+        for access in resource_access.values():
+            yield from access.get('roles', ())
+
+
+def extract_role_from_keycloak(keycloak_data: Dict[str, Any]) -> UserRole:
+    """
+    Витягує роль користувача з даних токена Keycloak
+
+    Args:
+        keycloak_data: Дані з Keycloak (claims токена або userinfo)
+
+    Returns:
+        UserRole
+    """
+    # Адміністратор має найвищий пріоритет. isdisjoint перебирає ролі на рівні C
+    # і зупиняється на першому збігу, не створюючи проміжної множини.
+    # Інші ролі (включно з диспетчером) дають роль за замовчуванням.
+    if not ADMIN_ROLES.isdisjoint(iter_keycloak_roles(keycloak_data)):
+        return UserRole.ADMIN
+    return UserRole.DISPATCHER
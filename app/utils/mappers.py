@@ -1,5 +1,6 @@
 from typing import Dict, List, Any, Optional, Type, TypeVar
-from datetime import datetime
+from datetime import datetime, timedelta
+from pydantic import TypeAdapter
 from app.models.user import User
 from app.models import Flight
 from app.models.crew_member import CrewMember
@@ -9,6 +10,43 @@ from app.models import OperationLog
 
 T = TypeVar('T')
 
+# Поля User, що віддаються клієнту в профілі
+_USER_PROFILE_FIELDS = {
+    'id', 'keycloak_id', 'username', 'email', 'first_name', 'last_name',
+    'role', 'is_active', 'created_at', 'updated_at'
+}
+
+# Таблиці відображуваних назв, будуються один раз при імпорті, а не на кожен
+# виклик to_dict для кожного елемента списку
+_POSITION_DISPLAY_NAMES = {
+    'PILOT': 'Пілот',
+    'CO_PILOT': 'Другий пілот',
+    'NAVIGATOR': 'Штурман',
+    'RADIO_OPERATOR': 'Радист',
+    'FLIGHT_ATTENDANT': 'Бортпровідник',
+    'FLIGHT_ENGINEER': 'Бортінженер'
+}
+_ASSIGNMENT_STATUS_DISPLAY = {
+    'ASSIGNED': 'Призначено',
+    'CONFIRMED': 'Підтверджено',
+    'CANCELLED': 'Скасовано'
+}
+_OPERATION_DISPLAY = {
+    'CREATE': 'Створення',
+    'UPDATE': 'Оновлення',
+    'DELETE': 'Видалення',
+    'SELECT': 'Перегляд',
+    'LOGIN': 'Вхід',
+    'LOGOUT': 'Вихід'
+}
+
+# Серіалізатори списків, що будуються один раз: весь список перетворюється
+# одним викликом ядра pydantic замість .dict() для кожного елемента
+_CREW_MEMBER_LIST_ADAPTER = TypeAdapter(List[CrewMember])
+_CREW_POSITION_LIST_ADAPTER = TypeAdapter(List[CrewPosition])
+
+_ONE_MINUTE = timedelta(minutes=1)
+
 
 class BaseMapper:
     """Базовий клас для всіх маперів"""
@@ -62,19 +100,10 @@ class UserMapper(BaseMapper):
     @staticmethod
     def to_dict(user: User) -> Dict[str, Any]:
         """Перетворення моделі User в словник"""
-        return {
-            'id': user.id,
-            'keycloak_id': user.keycloak_id,
-            'username': user.username,
-            'email': user.email,
-            'first_name': user.first_name,
-            'last_name': user.last_name,
-            'role': user.role,
-            'is_active': user.is_active,
-            'created_at': user.created_at.isoformat() if user.created_at else None,
-            'updated_at': user.updated_at.isoformat() if user.updated_at else None,
-            'full_name': f"{user.first_name} {user.last_name}"
-        }
+        # Серіалізація виконується ядром pydantic, дати одразу переводяться в ISO рядки
+        data = user.model_dump(include=_USER_PROFILE_FIELDS, mode='json')
+        data['full_name'] = f"{user.first_name} {user.last_name}"
+        return data
 
     @staticmethod
     def from_keycloak_data(keycloak_data: Dict[str, Any]) -> User:
@@ -150,7 +179,8 @@ class FlightMapper(BaseMapper):
     def _calculate_duration(departure: datetime, arrival: datetime) -> Optional[int]:
         """Розрахунок тривалості рейсу в хвилинах"""
         if departure and arrival:
-            return int((arrival - departure).total_seconds() / 60)
+            # Цілочисельне ділення timedelta без переходу до float секунд
+            return (arrival - departure) // _ONE_MINUTE
         return None
 
 
@@ -196,6 +226,11 @@ class CrewMemberMapper(BaseMapper):
             'experience_level': CrewMemberMapper._get_experience_level(crew_member.experience_years)
         }
 
+    @staticmethod
+    def to_dict_list(crew_members: List[CrewMember]) -> List[Dict[str, Any]]:
+        """Перетворення списку моделей CrewMember в список словників"""
+        return _CREW_MEMBER_LIST_ADAPTER.dump_python(crew_members)
+
     @staticmethod
     def _get_experience_level(years: int) -> str:
         """Визначення рівня досвіду"""
@@ -236,18 +271,15 @@ class CrewPositionMapper(BaseMapper):
             'display_name': CrewPositionMapper._get_display_name(position.position_name)
         }
 
+    @staticmethod
+    def to_dict_list(positions: List[CrewPosition]) -> List[Dict[str, Any]]:
+        """Перетворення списку моделей CrewPosition в список словників"""
+        return _CREW_POSITION_LIST_ADAPTER.dump_python(positions)
+
     @staticmethod
     def _get_display_name(position_name: str) -> str:
         """Отримання відображуваної назви посади"""
-        names = {
-            'PILOT': 'Пілот',
-            'CO_PILOT': 'Другий пілот',
-            'NAVIGATOR': 'Штурман',
-            'RADIO_OPERATOR': 'Радист',
-            'FLIGHT_ATTENDANT': 'Бортпровідник',
-            'FLIGHT_ENGINEER': 'Бортінженер'
-        }
-        return names.get(position_name, position_name)
+        return _POSITION_DISPLAY_NAMES.get(position_name, position_name)
 
 
 class FlightAssignmentMapper(BaseMapper):
@@ -284,12 +316,7 @@ class FlightAssignmentMapper(BaseMapper):
     @staticmethod
     def _get_status_display(status: str) -> str:
         """Отримання відображуваного статусу"""
-        statuses = {
-            'ASSIGNED': 'Призначено',
-            'CONFIRMED': 'Підтверджено',
-            'CANCELLED': 'Скасовано'
-        }
-        return statuses.get(status, status)
+        return _ASSIGNMENT_STATUS_DISPLAY.get(status, status)
 
 
 class OperationLogMapper(BaseMapper):
@@ -334,15 +361,7 @@ class OperationLogMapper(BaseMapper):
     @staticmethod
     def _get_operation_display(operation_type: str) -> str:
         """Отримання відображуваного типу операції"""
-        operations = {
-            'CREATE': 'Створення',
-            'UPDATE': 'Оновлення',
-            'DELETE': 'Видалення',
-            'SELECT': 'Перегляд',
-            'LOGIN': 'Вхід',
-            'LOGOUT': 'Вихід'
-        }
-        return operations.get(operation_type, operation_type)
+        return _OPERATION_DISPLAY.get(operation_type, operation_type)
 
 
 class GenericMapper:
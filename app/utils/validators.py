@@ -2,6 +2,7 @@ import re
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any
 from enum import Enum
+from functools import lru_cache
 import uuid
 
 
@@ -33,6 +34,12 @@ class AssignmentStatus(Enum):
     CANCELLED = "CANCELLED"
 
 
+@lru_cache(maxsize=32)
+def _enum_values(enum_class: Enum) -> frozenset:
+    """Набір допустимих значень enum (обчислюється один раз для кожного класу)"""
+    return frozenset(e.value for e in enum_class)
+
+
 class ValidationError(Exception):
     """Кастомний клас для помилок валідації"""
 
@@ -67,7 +74,7 @@ class BaseValidator:
     @staticmethod
     def validate_enum_value(value: str, enum_class: Enum, field_name: str) -> None:
         """Перевірка значення з enum"""
-        if value not in [e.value for e in enum_class]:
+        if value not in _enum_values(enum_class):
             valid_values = [e.value for e in enum_class]
             raise ValidationError(field_name, f"Допустимі значення: {', '.join(valid_values)}")
 
@@ -150,8 +157,8 @@ class FlightValidator(BaseValidator):
     AIRCRAFT_TYPES = ['Boeing 737', 'Boeing 747', 'Airbus A320', 'Airbus A330', 'Embraer 190']
 
     @classmethod
-    def validate_flight_data(cls, flight_data: Dict[str, Any]) -> List[str]:
-        """Валідація даних рейсу"""
+    def validate_flight_data(cls, flight_data: Dict[str, Any], now: Optional[datetime] = None) -> List[str]:
+        """Валідація даних рейсу. now - поточний час запиту, якщо вже отриманий викликачем"""
         errors = []
 
         try:
@@ -181,7 +188,8 @@ class FlightValidator(BaseValidator):
             # Перевірка часу
             cls.validate_flight_times(
                 flight_data.get('departure_time'),
-                flight_data.get('arrival_time')
+                flight_data.get('arrival_time'),
+                now
             )
         except ValidationError as e:
             errors.append(str(e))
@@ -222,7 +230,7 @@ class FlightValidator(BaseValidator):
             raise ValidationError('aircraft_type', f'Допустимі типи літаків: {", ".join(cls.AIRCRAFT_TYPES)}')
 
     @classmethod
-    def validate_flight_times(cls, departure_time: Any, arrival_time: Any) -> None:
+    def validate_flight_times(cls, departure_time: Any, arrival_time: Any, now: Optional[datetime] = None) -> None:
         """Валідація часу рейсу"""
         cls.validate_required_field(departure_time, 'departure_time')
         cls.validate_required_field(arrival_time, 'arrival_time')
@@ -253,7 +261,7 @@ class FlightValidator(BaseValidator):
             raise ValidationError('flight_times', 'Максимальна тривалість рейсу: 24 години')
 
         # Перевірка, що рейс не в минулому
-        if departure_time < datetime.now():
+        if departure_time < (now or datetime.now()):
             raise ValidationError('departure_time', 'Час відправлення не може бути в минулому')
 
     @classmethod